@@ -4,46 +4,105 @@
 """
 
 import os
-import logging.handlers
+import logging
 import asyncio
-import queue
+import codecs
+import sys
+import fnmatch
+import re
+import shutil
 import threading
+import time
+import traceback
+from collections import deque
+from pathlib import Path
+from typing import Any, Awaitable, Mapping, Optional
+from concurrent.futures import ThreadPoolExecutor
 
 import coloredlogs
+from git import Repo, InvalidGitRepositoryError, NoSuchPathError
 
-coloredlogs.install()
+try:
+    import readline  # 为 input() 提供行编辑和历史记录（POSIX）
+except ImportError:
+    readline = None
 
-from src.multi_agent_coder.git_utils import GitManager
-from src.multi_agent_coder.multi_repo_manager import MultiRepoManager
-from src.multi_agent_coder.llm_utils import LLMManager
-from src.multi_agent_coder.agents import CommenterAgent, CoderAgent
-from src.multi_agent_coder.collaboration import CollaborationManager
-from src.multi_agent_coder.config import get_config
-
-# 创建日志队列和处理器
-log_queue = queue.Queue()
-queue_handler = logging.handlers.QueueHandler(log_queue)
-
-# 创建文件和控制台处理器
-file_handler = logging.FileHandler('multi_agent_coder.log', encoding='utf-8')
-console_handler = logging.StreamHandler()
+try:
+    import uvloop  # 可选依赖：基于 libuv 的事件循环，调度、定时器和子进程开销更低（不支持 Windows）
+except ImportError:
+    uvloop = None
 
-# 设置格式
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
-console_handler.setFormatter(formatter)
+# 只在启动阶段就需要的轻量模块放在顶部；openai、代理等重量级模块在用户选好仓库后再导入
+from src.multi_agent_coder.config import get_config
+from src.multi_agent_coder.git_utils import GitManager, create_empty_issues_file
+from src.multi_agent_coder import json_utils
+from src.multi_agent_coder.fs_utils import copy_file
 
-# 创建监听器
-listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+class BatchedFileHandler(logging.FileHandler):
+    """批量刷新的日志文件处理器
+    
+    使用较大的写缓冲区，每 flush_every 条记录或距上次刷新超过 flush_interval 秒才刷新一次磁盘
+    （时间在新记录到来时检查）；ERROR 及以上级别的记录立即刷新，
+    显式调用 flush() 和关闭时也会立即写出。文件在第一条记录到来时才打开。
+    """
+    
+    def __init__(self, filename: str, encoding: Optional[str] = None,
+                 flush_every: int = 64, buffer_size: int = 1 << 16, flush_interval: float = 1.0):
+        """初始化处理器
+        
+        Args:
+            filename: 日志文件路径
+            encoding: 文件编码
+            flush_every: 每隔多少条记录刷新一次
+            buffer_size: 写缓冲区大小（字节）
+            flush_interval: 距上次刷新超过多少秒时刷新
+        """
+        self.flush_every = flush_every
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        self._defer_flush = False
+        super().__init__(filename, encoding=encoding, delay=True)
+    
+    def _open(self):
+        return open(self.baseFilename, self.mode, buffering=self.buffer_size,
+                    encoding=self.encoding, errors=self.errors)
+    
+    def emit(self, record):
+        # StreamHandler.emit 每条记录都会调用 flush()，这里只在攒够一批、间隔足够久或遇到错误时才真正刷新
+        self._pending += 1
+        self._defer_flush = (self._pending < self.flush_every and record.levelno < logging.ERROR
+                             and time.monotonic() - self._last_flush < self.flush_interval)
+        try:
+            super().emit(record)
+        finally:
+            self._defer_flush = False
+    
+    def flush(self):
+        if self._defer_flush:
+            return
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        super().flush()
 
-# 配置根日志器
-logging.basicConfig(
-    level=logging.INFO,
-    handlers=[queue_handler]
-)
+# 创建文件处理器（控制台输出由 coloredlogs 负责）
+# 写入先进入内存缓冲区，emit 不会阻塞在磁盘上，因此直接挂到根日志器，无需队列和后台监听线程
+file_handler = BatchedFileHandler('multi_agent_coder.log', encoding='utf-8')
+file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
 
-# 启动监听器
-listener.start()
+def setup_logging():
+    """配置日志级别和处理器
+    
+    日志级别由 LOG_LEVEL 环境变量控制，默认 INFO。
+    """
+    level = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+    coloredlogs.install(level=level)
+    
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    if file_handler not in root_logger.handlers:
+        root_logger.addHandler(file_handler)
 
 # 设置特定模块的日志级别，减少噪音
 logging.getLogger('multi_agent_coder.agents.memory_manager').setLevel(logging.WARNING)
@@ -54,127 +113,313 @@ logging.getLogger('urllib3').setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
-def get_user_repo():
-    """交互式获取用户Git仓库路径"""
-    print("=" * 60)
-    print("🚀 Multi-Agent Coder - 智能体协作编程系统")
-    print("=" * 60)
-    print()
-    print("💡 请指定你要使用的Git仓库：")
-    print("   - 本地项目路径（如：/path/to/project）")
-    print("   - GitHub仓库URL（如：https://github.com/user/repo.git）")
-    print("   - 留空使用当前目录")
-    print()
-    
-    user_projects_dir = os.path.join(os.getcwd(), "user_projects")
-    os.makedirs(user_projects_dir, exist_ok=True)
+def _shallow_args(depth: int) -> list[str]:
+    """生成浅克隆/部分克隆参数
+    
+    Args:
+        depth: 历史深度，0 表示获取完整历史
+        
+    Returns:
+        git 命令行参数列表
+    """
+    if depth <= 0:
+        return []
+    # 只需要工作区：只取最近的提交，历史blob按需获取，且只拉取默认分支
+    return [f'--depth={depth}', '--filter=blob:none', '--single-branch']
+
+# 克隆失败时在错误信息中保留的git输出行数
+CLONE_ERROR_TAIL_LINES = 20
+
+# git进度行以\r或\n结尾
+_PROGRESS_LINE_SPLIT_RE = re.compile(r'[\r\n]')
+
+async def clone_repo(repo_url: str, clone_dir: str, depth: int) -> bool:
+    """克隆远程仓库（异步子进程，不阻塞事件循环）
+    
+    depth 大于0时使用浅克隆+部分克隆。git的进度输出实时转发到终端，
+    只保留最后几行用于失败时的错误信息，不会缓存整个传输过程的输出。
+    
+    Args:
+        repo_url: 仓库URL
+        clone_dir: 克隆目标目录
+        depth: 克隆历史深度（系统配置 clone_depth），0 表示克隆完整历史
+        
+    Returns:
+        是否克隆成功
+    """
+    print(f"📥 克隆仓库到: {clone_dir}")
+    tail = deque(maxlen=CLONE_ERROR_TAIL_LINES)
+    try:
+        # stdout无用直接丢弃；stderr承载进度信息，按块流式读取
+        proc = await asyncio.create_subprocess_exec(
+            'git', 'clone', '--progress', *_shallow_args(depth), repo_url, clone_dir,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+        # 进度行用\r原地刷新，不能按行读取；增量解码避免多字节字符被块边界截断
+        decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        pending = ''
+        while chunk := await proc.stderr.read(4096):
+            text = decoder.decode(chunk)
+            sys.stdout.write(text)
+            sys.stdout.flush()
+            *lines, pending = _PROGRESS_LINE_SPLIT_RE.split(pending + text)
+            tail.extend(line for line in lines if line)
+        if pending:
+            tail.append(pending)
+        await proc.wait()
+    except Exception as e:
+        print(f"❌ 克隆过程出错: {e}")
+        print("💡 请确保已安装Git并且网络连接正常")
+        return False
+    
+    if proc.returncode != 0:
+        print("❌ 克隆失败: " + "\n".join(tail))
+        print("💡 请检查网络连接和仓库URL是否正确")
+        return False
+    
+    print(f"✅ 成功克隆仓库: {clone_dir}")
+    return True
+
+async def update_repo(repo_dir: str) -> bool:
+    """更新已存在的克隆目录：拉取上游并快进当前分支，不重新克隆
+    
+    不传 --depth：完整克隆不会变成浅克隆，浅克隆保持浅克隆并只获取新提交
+    （对浅克隆重新指定深度会移动浅边界，导致无法快进）。本地有分叉的提交时快进失败，保留本地内容不做覆盖。
+    
+    Args:
+        repo_dir: 已存在的仓库目录
+        
+    Returns:
+        是否更新成功（失败时仍可继续使用现有内容）
+    """
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            'git', '-C', repo_dir, 'pull', '--ff-only',
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await proc.communicate()
+    except Exception as e:
+        print(f"⚠️  更新现有仓库出错: {e}")
+        return False
+    
+    if proc.returncode != 0:
+        print(f"⚠️  更新现有仓库失败，继续使用本地内容: {stderr.decode('utf-8', 'replace')}")
+        return False
+    
+    print(f"✅ 已更新现有仓库: {repo_dir}")
+    return True
+
+async def init_repo(repo_dir: str) -> bool:
+    """初始化Git仓库（异步子进程，无需切换工作目录）
+    
+    Args:
+        repo_dir: 仓库目录
+        
+    Returns:
+        是否初始化成功
+    """
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            'git', '-C', repo_dir, 'init',
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+        )
+        _, stderr = await proc.communicate()
+    except Exception as e:
+        print(f"❌ 初始化失败: {e}")
+        return False
+    
+    if proc.returncode != 0:
+        print(f"❌ 初始化失败: {stderr.decode('utf-8', 'replace')}")
+        return False
+    
+    print(f"✅ 已初始化Git仓库: {repo_dir}")
+    return True
+
+async def _ainput(prompt: str) -> str:
+    """在守护线程中执行 input()，等待用户输入时不阻塞事件循环
+    
+    不使用默认线程池：Ctrl+C 取消等待后，阻塞在 input() 中的线程无法被打断，
+    放在线程池里会让事件循环关闭时一直等到用户按下回车；守护线程则随进程直接退出。
+    
+    Args:
+        prompt: 提示文本
+        
+    Returns:
+        用户输入
+        
+    Raises:
+        EOFError: 标准输入已关闭（如 Ctrl+D）
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    
+    def set_result(value=None, exc=None):
+        # 等待已被取消时丢弃结果
+        if future.done():
+            return
+        if exc is not None:
+            future.set_exception(exc)
+        else:
+            future.set_result(value)
+    
+    def read_line():
+        try:
+            args = (input(prompt),)
+        except BaseException as e:
+            args = (None, e)
+        try:
+            loop.call_soon_threadsafe(set_result, *args)
+        except RuntimeError:
+            pass  # 事件循环已关闭
+    
+    threading.Thread(target=read_line, name="stdin-reader", daemon=True).start()
+    return await future
+
+# 以GitHub地址开头的输入（含 http、www 和省略协议的写法），不再当作本地路径处理
+GITHUB_PREFIX_RE = re.compile(r'^(?:(?:https?://)?(?:www\.)?github\.com(?:[/:]|$)|git@github\.com:)', re.IGNORECASE)
+
+# 可克隆的GitHub仓库URL：http(s)://(www.)github.com/owner/repo(.git)(/) 或 git@github.com:owner/repo(.git)
+GITHUB_URL_RE = re.compile(
+    r'^(?:https?://(?:www\.)?github\.com/|git@github\.com:)(?P<owner>[^/]+)/(?P<name>[^/]+?)(?:\.git)?/?$',
+    re.IGNORECASE
+)
+
+def classify_repo_input(repo_input: str) -> str:
+    """判断用户输入的仓库类型
+    
+    先按前缀识别GitHub地址，再用完整格式校验；以GitHub开头但格式不对的输入单独报告，
+    不会被误当作本地路径。
+    
+    Args:
+        repo_input: 用户输入（已去除首尾空白）
+        
+    Returns:
+        "default"（留空）、"github"（GitHub URL）、"unsupported_github"（无法识别的GitHub地址）
+        或 "local"（本地路径）
+    """
+    if not repo_input:
+        return "default"
+    if GITHUB_PREFIX_RE.match(repo_input):
+        return "github" if GITHUB_URL_RE.match(repo_input) else "unsupported_github"
+    return "local"
+
+async def get_user_repo(config: Awaitable[Mapping[str, Mapping[str, Any]]]):
+    """交互式获取用户Git仓库路径
+    
+    Args:
+        config: 正在加载的完整配置，需要克隆时才等待它，从中读取克隆深度
+    """
+    # 标题和说明拼成一个字符串一次写出
+    sys.stdout.write("\n".join([
+        "=" * 60,
+        "🚀 Multi-Agent Coder - 智能体协作编程系统",
+        "=" * 60,
+        "",
+        "💡 请指定你要使用的Git仓库：",
+        "   - 本地项目路径（如：/path/to/project）",
+        "   - GitHub仓库URL（如：https://github.com/user/repo.git）",
+        "   - 留空使用当前目录",
+        "",
+    ]) + "\n")
+    sys.stdout.flush()
+    
+    cwd = os.getcwd()
+    user_projects_dir = Path(cwd) / "user_projects"
+    user_projects_dir.mkdir(exist_ok=True)
+    
+    if readline is not None:
+        # 预置当前目录到输入历史，按↑即可编辑；输入失败后也可直接修改上一次的输入
+        readline.add_history(cwd)
     
     while True:
         try:
-            repo_input = input("📁 Git仓库路径或URL: ").strip()
+            repo_input = (await _ainput("📁 Git仓库路径或URL: ")).strip()
+            repo_kind = classify_repo_input(repo_input)
             
             # 如果用户按回车，使用 user_projects 目录下的当前目录名
-            if not repo_input:
-                repo_path = os.path.join(user_projects_dir, "current_project")
+            if repo_kind == "default":
+                repo_path = user_projects_dir / "current_project"
                 print(f"📍 使用 user_projects 目录: {repo_path}")
-                if not os.path.exists(repo_path):
-                    os.makedirs(repo_path)
+                repo_path.mkdir(exist_ok=True)
+            
+            # 以GitHub开头但格式无法识别，提示重新输入而不是当作本地路径
+            elif repo_kind == "unsupported_github":
+                print(f"❌ 不支持的GitHub仓库地址: {repo_input}")
+                print("💡 请使用 https://github.com/owner/repo 或 git@github.com:owner/repo.git 格式")
+                continue
             
             # 检查是否是GitHub URL
-            elif repo_input.startswith(('https://github.com/', 'git@github.com:', 'http://github.com/')):
+            elif repo_kind == "github":
                 print(f"🌐 检测到GitHub仓库: {repo_input}")
                 
-                # 提取仓库名
-                if repo_input.endswith('.git'):
-                    repo_name = repo_input.split('/')[-1][:-4]
-                else:
-                    repo_name = repo_input.split('/')[-1]
+                # 提取仓库名（正确处理 .git 后缀和末尾斜杠）
+                repo_name = GITHUB_URL_RE.match(repo_input).group('name')
                 
                 # 在 user_projects 目录下创建克隆目录
-                clone_dir = os.path.join(user_projects_dir, repo_name)
+                clone_dir = user_projects_dir / repo_name
+                clone_depth = (await config)["system"]["clone_depth"]
                 
                 # 检查目录是否已存在
-                if os.path.exists(clone_dir):
+                if clone_dir.exists():
                     print(f"⚠️  目录已存在: {clone_dir}")
-                    choice = input("🤔 是否使用现有目录？(y/n): ").strip().lower()
+                    choice = (await _ainput("🤔 是否使用现有目录？(y/n): ")).strip().lower()
                     if choice in ['y', 'yes', '是']:
                         repo_path = clone_dir
                         print(f"✅ 使用现有目录: {repo_path}")
+                        await update_repo(str(repo_path))
                     else:
                         # 询问新的目录名
-                        new_name = input(f"📝 请输入新的目录名（默认：{repo_name}_clone）: ").strip()
+                        new_name = (await _ainput(f"📝 请输入新的目录名（默认：{repo_name}_clone）: ")).strip()
                         if not new_name:
                             new_name = f"{repo_name}_clone"
-                        clone_dir = os.path.join(user_projects_dir, new_name)
+                        clone_dir = user_projects_dir / new_name
                         
-                        print(f"📥 克隆仓库到: {clone_dir}")
-                        try:
-                            import subprocess
-                            result = subprocess.run(['git', 'clone', repo_input, clone_dir], 
-                                                  capture_output=True, text=True)
-                            if result.returncode == 0:
-                                print(f"✅ 成功克隆仓库: {clone_dir}")
-                                repo_path = clone_dir
-                            else:
-                                print(f"❌ 克隆失败: {result.stderr}")
-                                continue
-                        except Exception as e:
-                            print(f"❌ 克隆过程出错: {e}")
+                        if not await clone_repo(repo_input, str(clone_dir), clone_depth):
                             continue
+                        repo_path = clone_dir
                 else:
-                    print(f"📥 克隆仓库到: {clone_dir}")
-                    try:
-                        import subprocess
-                        result = subprocess.run(['git', 'clone', repo_input, clone_dir], 
-                                              capture_output=True, text=True)
-                        if result.returncode == 0:
-                            print(f"✅ 成功克隆仓库: {clone_dir}")
-                            repo_path = clone_dir
-                        else:
-                            print(f"❌ 克隆失败: {result.stderr}")
-                            print("💡 请检查网络连接和仓库URL是否正确")
-                            continue
-                    except Exception as e:
-                        print(f"❌ 克隆过程出错: {e}")
-                        print("💡 请确保已安装Git并且网络连接正常")
+                    if not await clone_repo(repo_input, str(clone_dir), clone_depth):
                         continue
+                    repo_path = clone_dir
             
             else:
                 # 处理本地路径，统一放到 user_projects 目录下
-                abs_input_path = os.path.abspath(os.path.expanduser(repo_input))
-                repo_name = os.path.basename(abs_input_path.rstrip("/"))
-                repo_path = os.path.join(user_projects_dir, repo_name)
+                abs_input_path = Path(os.path.abspath(os.path.expanduser(repo_input)))
+                repo_path = user_projects_dir / abs_input_path.name
                 
-                # 如果源路径存在且不是 user_projects 目录下的，复制到 user_projects 下
-                if os.path.exists(abs_input_path) and abs_input_path != repo_path:
-                    import shutil
-                    if not os.path.exists(repo_path):
-                        shutil.copytree(abs_input_path, repo_path)
-                        print(f"✅ 已将本地项目复制到: {repo_path}")
-                elif not os.path.exists(abs_input_path):
+                # 一次stat判断源路径是否存在
+                try:
+                    abs_input_path.stat()
+                except FileNotFoundError:
                     print(f"❌ 路径不存在: {abs_input_path}")
                     print("💡 请检查路径是否正确，或输入GitHub仓库URL进行克隆")
                     continue
+                
+                # 如果源路径不是 user_projects 目录下的，复制到 user_projects 下（目标已存在时保留现有副本）
+                if abs_input_path != repo_path:
+                    try:
+                        await asyncio.to_thread(shutil.copytree, abs_input_path, repo_path)
+                        print(f"✅ 已将本地项目复制到: {repo_path}")
+                    except FileExistsError:
+                        pass
             
             # 检查是否是Git仓库
-            git_dir = os.path.join(repo_path, '.git')
-            if not os.path.exists(git_dir):
+            # 由GitPython校验仓库（能识别worktree的.git文件，也不会把空的.git目录当成仓库）
+            try:
+                Repo(repo_path)
+                is_git_repo = True
+            except (InvalidGitRepositoryError, NoSuchPathError):
+                is_git_repo = False
+            
+            if not is_git_repo:
                 print(f"⚠️  这不是一个Git仓库: {repo_path}")
                 
                 # 询问是否初始化
                 while True:
-                    init_choice = input("🤔 是否要初始化为Git仓库？(y/n): ").strip().lower()
+                    init_choice = (await _ainput("🤔 是否要初始化为Git仓库？(y/n): ")).strip().lower()
                     if init_choice in ['y', 'yes', '是']:
-                        try:
-                            current_dir = os.getcwd()
-                            os.chdir(repo_path)
-                            os.system('git init')
-                            os.chdir(current_dir)
-                            print(f"✅ 已初始化Git仓库: {repo_path}")
-                            break
-                        except Exception as e:
-                            print(f"❌ 初始化失败: {e}")
-                            break
+                        await init_repo(str(repo_path))
+                        break
                     elif init_choice in ['n', 'no', '否']:
                         print("💡 请选择一个已经是Git仓库的目录，或者手动运行 'git init'")
                         break
@@ -189,45 +434,248 @@ def get_user_repo():
             print()
             
             # 检查用户项目是否包含Issues文件（仅作参考，实际使用playground的Issues）
-            issues_file = os.path.join(repo_path, '.issues.json')
-            if os.path.exists(issues_file):
-                try:
-                    import json
-                    with open(issues_file, 'r', encoding='utf-8') as f:
-                        issues_data = json.load(f)
-                    
-                    if issues_data.get('issues') and len(issues_data['issues']) > 0:
-                        print(f"📋 发现用户项目中有 {len(issues_data['issues'])} 个Issues")
-                        print("💡 注意：系统将使用独立的playground仓库管理Issues")
-                    else:
-                        print("✅ 用户项目Issues文件为空")
-                except Exception as e:
-                    print(f"⚠️  检查用户项目Issues文件时出错: {e}")
-            else:
+            issues_file = repo_path / '.issues.json'
+            try:
+                # 直接打开文件，不存在时由异常判断，省去单独的存在性检查
+                with open(issues_file, 'rb') as f:
+                    content = f.read()
+                
+                issues = json_utils.loads(content).get('issues') if content.strip() else None
+                if issues:
+                    print(f"📋 发现用户项目中有 {len(issues)} 个Issues")
+                    print("💡 注意：系统将使用独立的playground仓库管理Issues")
+                else:
+                    print("✅ 用户项目Issues文件为空")
+            except FileNotFoundError:
                 print("📝 用户项目中没有Issues文件，系统将创建独立的Issues管理")
+            except Exception as e:
+                print(f"⚠️  检查用户项目Issues文件时出错: {e}")
             
-            return repo_path
+            return str(repo_path)
             
-        except KeyboardInterrupt:
+        except EOFError:
+            # 标准输入已关闭（Ctrl+D），无法继续交互
+            print("\n\n👋 用户取消，退出系统")
+            return None
+        except asyncio.CancelledError:
+            # Ctrl+C 时 asyncio.Runner 会取消主任务
             print("\n\n👋 用户取消，退出系统")
-            exit(0)
+            raise
         except Exception as e:
             print(f"❌ 发生错误: {e}")
             print("💡 请重新输入路径或URL")
 
-async def main():
-    """主函数"""
+# 复制参考项目时忽略的文件和目录
+PROJECT_IGNORE_PATTERNS = (
+    '.git', '.git/*',
+    '__pycache__', '*.pyc', '*.pyo',
+    '.DS_Store', 'Thumbs.db',
+    'node_modules',
+    '.pytest_cache',
+    '*.log',
+    '.coverage',
+    '.venv', 'venv',
+    '.env', '.env.*'
+)
+
+# 源路径是当前目录时，额外排除我们系统自身的文件
+SELF_IGNORE_PATTERNS = (
+    'agent_repos', 'agent_repos/*',
+    'src/multi_agent_coder*',
+    'test_*.py',
+    'pyproject.toml',
+    'uv.lock',
+    'requirements.txt',
+    '*.egg-info', '*.egg-info/*',
+    'run.py',
+    'test_startup.py'
+)
+
+def compile_ignore_patterns(patterns) -> tuple[frozenset, Optional[re.Pattern]]:
+    """把忽略模式拆成精确名称集合和一个合并编译的通配符正则
+    
+    大部分模式是不含通配符的完整名称，用集合查找即可；只有真正的通配符模式才需要正则。
+    含路径分隔符的模式永远匹配不到单个文件名，直接丢弃。
+    
+    Args:
+        patterns: fnmatch 风格的模式列表
+        
+    Returns:
+        (精确名称集合, 通配符正则；没有通配符模式时为 None)
+    """
+    exact_names = set()
+    glob_patterns = []
+    for pattern in patterns:
+        if '/' in pattern:
+            continue
+        if any(ch in pattern for ch in '*?['):
+            glob_patterns.append(pattern)
+        else:
+            exact_names.add(pattern)
+    glob_re = re.compile('|'.join(f'(?:{fnmatch.translate(p)})' for p in glob_patterns)) if glob_patterns else None
+    return frozenset(exact_names), glob_re
+
+def make_should_copy(is_current_dir_source: bool):
+    """创建复制参考项目时使用的文件名过滤函数
+    
+    Args:
+        is_current_dir_source: 源路径是否就是当前目录（此时额外排除系统自身的文件）
+        
+    Returns:
+        过滤函数 name -> bool，返回 True 表示应该复制
+    """
+    ignore_patterns = PROJECT_IGNORE_PATTERNS
+    if is_current_dir_source:
+        ignore_patterns = PROJECT_IGNORE_PATTERNS + SELF_IGNORE_PATTERNS
+    exact_names, glob_re = compile_ignore_patterns(ignore_patterns)
+    
+    if glob_re is None:
+        def should_copy_file(name: str) -> bool:
+            """判断是否应该复制文件"""
+            return name not in exact_names
+    else:
+        glob_match = glob_re.match
+        
+        def should_copy_file(name: str) -> bool:
+            """判断是否应该复制文件（先做集合查找，未命中再匹配通配符）"""
+            return name not in exact_names and not glob_match(name)
+    
+    return should_copy_file
+
+def scan_project_tree(source_root: str, dest_root: str, should_copy,
+                      pruned_dirs: frozenset = frozenset(), max_files: int = 0,
+                      max_bytes: int = 0) -> Optional[tuple[list[str], list[tuple[str, str]]]]:
+    """用 os.scandir 递归收集需要复制的文件（只读取源目录，不写目标目录）
+    
+    Args:
+        source_root: 源目录
+        dest_root: 目标目录
+        should_copy: 按文件/目录名过滤的函数，被排除的目录不会进入
+        pruned_dirs: 直接剪枝的目录名集合，命中时不再调用过滤函数
+        max_files: 文件数上限，0 表示不限制
+        max_bytes: 文件总字节数上限，0 表示不限制
+        
+    Returns:
+        (需要创建的目标目录列表, (源文件, 目标文件) 路径对列表)；超过上限时提前停止扫描并返回 None
+    """
+    pairs = []
+    dst_dirs = []
+    total_bytes = 0
+    stack = [(source_root, dest_root)]
+    while stack:
+        src_dir, dst_dir = stack.pop()
+        dst_dirs.append(dst_dir)
+        with os.scandir(src_dir) as it:
+            for entry in it:
+                # DirEntry 缓存了类型信息，无需额外 stat
+                is_dir = entry.is_dir(follow_symlinks=False)
+                # 常见的大目录先用集合查找剪枝，省去正则匹配
+                if (is_dir and entry.name in pruned_dirs) or not should_copy(entry.name):
+                    continue
+                dst_path = os.path.join(dst_dir, entry.name)
+                if is_dir:
+                    stack.append((entry.path, dst_path))
+                elif entry.is_file():
+                    pairs.append((entry.path, dst_path))
+                    if max_files and len(pairs) > max_files:
+                        return None
+                    if max_bytes:
+                        total_bytes += entry.stat().st_size
+                        if total_bytes > max_bytes:
+                            return None
+    return dst_dirs, pairs
+
+# 复制失败时日志中列出的样例数量
+COPY_FAILURE_SAMPLES = 10
+
+def _copy_one(pair: tuple[str, str]) -> Optional[str]:
+    """复制单个文件
+    
+    Args:
+        pair: (源文件, 目标文件)
+        
+    Returns:
+        复制成功返回 None，失败返回错误信息（由调用方汇总记录，不逐个写日志）
+    """
+    src_file, dst_file = pair
     try:
-        # 🆕 交互式获取用户Git仓库
-        user_repo_path = get_user_repo()
+        # 参考代码不需要保留时间戳和扩展属性，只复制内容（Linux上在内核中完成）和权限位
+        copy_file(src_file, dst_file)
+        return None
+    except Exception as e:
+        return str(e)
+
+def copy_scanned_tree(dst_dirs: list[str], pairs: list[tuple[str, str]]) -> list[str]:
+    """创建目标目录后用线程池并发复制扫描结果（阻塞操作，应在工作线程中调用）
+    
+    Args:
+        dst_dirs: 需要创建的目标目录
+        pairs: (源文件, 目标文件) 路径对列表
         
-        # 获取配置
-        config = get_config()
+    Returns:
+        成功复制的目标文件路径列表
+    """
+    for dst_dir in dst_dirs:
+        os.makedirs(dst_dir, exist_ok=True)
+    if not pairs:
+        return []
+    copied = []
+    failures = []
+    # 复制以系统调用为主，多个线程可以让磁盘读写重叠进行
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        for (src_file, dst_file), error in zip(pairs, executor.map(_copy_one, pairs)):
+            if error is None:
+                copied.append(dst_file)
+            else:
+                failures.append((src_file, error))
+    # 权限或失效链接之类的问题往往成批出现，汇总成一条日志，只列出前几个样例
+    if failures:
+        samples = "; ".join(f"{src_file}: {error}" for src_file, error in failures[:COPY_FAILURE_SAMPLES])
+        logger.warning(f"⚠️ {len(failures)} 个文件复制失败，前 {min(len(failures), COPY_FAILURE_SAMPLES)} 个: {samples}")
+    return copied
+
+async def ensure_playground_issues(playground_git_manager: GitManager) -> bool:
+    """确保playground仓库有Issues文件（只创建文件，由调用方与其他改动一起提交）
+    
+    Args:
+        playground_git_manager: playground仓库的GitManager
         
-        # 🆕 将用户指定的仓库路径覆盖配置
-        config["system"]["repo_path"] = user_repo_path
+    Returns:
+        是否新建了Issues文件（需要提交）
+    """
+    logger.info("🔄 设置playground仓库的Issues文件...")
+    try:
+        # 检查playground仓库是否已有Issues文件，没有则创建（在工作线程中执行，不阻塞事件循环）
+        playground_issues_file = os.path.join(playground_git_manager.repo_path, ".issues.json")
+        created = await asyncio.to_thread(create_empty_issues_file, playground_issues_file)
         
-        # 获取 API 密钥
+        if created:
+            logger.info("✅ 在playground仓库创建了Issues文件")
+        else:
+            logger.info("✅ playground仓库已有Issues文件")
+        return created
+            
+    except Exception as e:
+        logger.error(f"❌ 设置playground仓库Issues文件失败: {e}")
+        return False
+
+async def _run_agent(agent):
+    """运行单个代理，异常只记录不外抛，避免TaskGroup因此取消其他代理
+    
+    Args:
+        agent: 评论员或编码员代理
+    """
+    try:
+        await agent.run()
+    except Exception as e:
+        logger.error(f"❌ 代理 {agent.agent_id} 异常退出: {e}")
+
+async def main():
+    """主函数"""
+    setup_logging()
+    http_client = None
+    try:
+        # 获取 API 密钥（在交互和克隆仓库之前检查，尽早失败）
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             print("❌ 未设置 OPENAI_API_KEY 环境变量")
@@ -235,193 +683,177 @@ async def main():
             print("   export OPENAI_API_KEY=\"your-api-key\"")
             raise ValueError("未设置 OPENAI_API_KEY 环境变量")
         
+        # 🆕 交互式获取用户Git仓库（输入和克隆都以异步方式等待）
+        # 等待用户输入期间同时加载配置，克隆仓库时从中读取克隆深度
+        config_task = asyncio.ensure_future(asyncio.to_thread(get_config))
+        user_repo_path = await get_user_repo(config_task)
+        config = await config_task
+        if user_repo_path is None:
+            return
+        system_config = config["system"]
+        
+        # 用户选好仓库后再导入重量级模块，避免拖慢交互前的启动
+        from src.multi_agent_coder.multi_repo_manager import MultiRepoManager, IGNORED_DIRS
+        from src.multi_agent_coder.llm_utils import LLMManager, AdaptiveConcurrencyLimiter, CircuitBreaker
+        from src.multi_agent_coder.agents import CommenterAgent, CoderAgent
+        from src.multi_agent_coder.collaboration import CollaborationManager
+        
         # 获取代理配置（可选）
         proxy_url = os.getenv("OPENAI_PROXY_URL")
         if proxy_url:
             print(f"🌐 使用代理: {proxy_url}")
         
         print("🤖 初始化LLM管理器...")
-        # 初始化 LLM 管理器
-        llm_manager = LLMManager(api_key, proxy_url=proxy_url)
+        # 所有LLM管理器共享同一个HTTP客户端，连接池随coder数量放大
+        http_client = LLMManager.create_http_client(
+            proxy_url,
+            max_connections=max(256, 64 * system_config["num_coders"]),
+            max_keepalive_connections=max(64, 16 * system_config["num_coders"])
+        )
+        # 所有LLM管理器共享同一个并发限制器，使并发上限作用于整个系统而不是单个管理器
+        llm_limiter = AdaptiveConcurrencyLimiter(config["llm"]["max_concurrency"])
+        # 共享熔断器：服务端持续限流/出错时所有代理一起暂停调用
+        llm_breaker = CircuitBreaker(
+            config["llm"]["breaker_failure_threshold"],
+            config["llm"]["breaker_cooldown"]
+        )
         
         # 检查是否使用多仓库模式
-        if config["system"]["use_separate_repos"]:
+        if system_config["use_separate_repos"]:
             print("📚 启动多仓库协作模式...")
             logger.info("使用多仓库模式")
             
-            # 🆕 playground_repo设为空字符串，创建独立的协作空间
-            config["system"]["playground_repo"] = ""  # 不使用用户仓库作为playground
-            
+            # 🆕 playground不使用用户仓库（传入空URL），创建独立的协作空间
             # 初始化多仓库管理器
             multi_repo_manager = MultiRepoManager(
-                config["system"]["playground_repo"],
-                config["system"]["agent_repos_dir"]
+                "",
+                system_config["agent_repos_dir"],
+                system_config["max_parallel_repo_setups"]
             )
             
+            # 🆕 关键步骤：复制用户项目内容到playground仓库，让agent能学习参考代码
+            # 复制用户项目的所有内容到playground（除了.git目录）
+            # 🆕 智能项目检测：如果用户选择的是当前目录（我们的多智能体系统），
+            # 优先查找AgentGPT目录作为参考项目
+            current_dir = os.path.abspath(os.getcwd())
+            user_dir = os.path.abspath(user_repo_path)
+            
+            if user_dir == current_dir:
+                logger.info("检测到用户选择当前目录")
+                # 检查是否有AgentGPT目录
+                agentgpt_path = os.path.join(user_repo_path, "AgentGPT")
+                if os.path.exists(agentgpt_path):
+                    logger.info("找到AgentGPT项目，将其作为参考项目")
+                    source_path = agentgpt_path
+                    project_name = "AgentGPT"
+                else:
+                    logger.warning("⚠️ 在当前目录未找到AgentGPT项目")
+                    logger.info("将复制当前目录的内容（排除系统文件）")
+                    source_path = user_repo_path
+                    project_name = "当前项目"
+            else:
+                logger.info(f"复制用户指定的项目: {user_repo_path}")
+                source_path = user_repo_path
+                project_name = os.path.basename(user_repo_path)
+            
+            # 是否额外排除系统自身文件在复制前就确定下来，过滤函数只做一次正则匹配
+            should_copy_file = make_should_copy(os.path.abspath(source_path) == current_dir)
+            
+            # 扫描参考项目只读取源目录，与playground仓库的设置互不依赖：
+            # 扫描在工作线程中先行开始，与仓库初始化重叠进行
+            playground_path = os.path.abspath(multi_repo_manager.playground_path)
+            scan_task = asyncio.create_task(asyncio.to_thread(
+                scan_project_tree, source_path, playground_path, should_copy_file,
+                IGNORED_DIRS, system_config["seed_max_files"], system_config["seed_max_bytes"]
+            ))
+            
             # 设置playground仓库
             playground_git_manager = await multi_repo_manager.setup_playground_repo()
             
-            # 🆕 关键步骤：复制用户项目内容到playground仓库，让agent能学习参考代码
-            logger.info("📁 复制用户项目内容到playground仓库...")
-            try:
-                # 复制用户项目的所有内容到playground（除了.git目录）
-                import shutil
-                import fnmatch
-                
-                # 🆕 智能项目检测：如果用户选择的是当前目录（我们的多智能体系统），
-                # 优先查找AgentGPT目录作为参考项目
-                current_dir = os.path.abspath(os.getcwd())
-                user_dir = os.path.abspath(user_repo_path)
+            async def seed_playground():
+                """把扫描到的参考项目复制到playground，返回需要提交的相对路径，失败只记录不外抛"""
+                logger.info("📁 复制用户项目内容到playground仓库...")
+                try:
+                    scanned = await scan_task
                 
-                if user_dir == current_dir:
-                    logger.info("检测到用户选择当前目录")
-                    # 检查是否有AgentGPT目录
-                    agentgpt_path = os.path.join(user_repo_path, "AgentGPT")
-                    if os.path.exists(agentgpt_path):
-                        logger.info("找到AgentGPT项目，将其作为参考项目")
-                        source_path = agentgpt_path
-                        project_name = "AgentGPT"
+                    if scanned is None:
+                        # 项目过大：不复制也不提交，改为以git忽略的符号链接只读引用原项目，各agent仓库中同样可用
+                        reference_link = await asyncio.to_thread(multi_repo_manager.link_reference_project, source_path)
+                        logger.warning(f"⚠️ 跳过复制{project_name}到playground：超过复制上限"
+                                       f"（{system_config['seed_max_files']} 个文件 / {system_config['seed_max_bytes']} 字节）；"
+                                       f"改为只读链接 {reference_link}，不纳入git，各agent仓库中同样位于 reference/")
                     else:
-                        logger.warning("⚠️ 在当前目录未找到AgentGPT项目")
-                        logger.info("将复制当前目录的内容（排除系统文件）")
-                        source_path = user_repo_path
-                        project_name = "当前项目"
-                else:
-                    logger.info(f"复制用户指定的项目: {user_repo_path}")
-                    source_path = user_repo_path
-                    project_name = os.path.basename(user_repo_path)
-                
-                # 通用的文件过滤函数
-                def should_copy_file(root, name, source_root):
-                    """判断是否应该复制文件"""
-                    # 基本的忽略模式
-                    ignore_patterns = [
-                        '.git', '.git/*',
-                        '__pycache__', '*.pyc', '*.pyo',
-                        '.DS_Store', 'Thumbs.db',
-                        'node_modules',
-                        '.pytest_cache',
-                        '*.log',
-                        '.coverage',
-                        '.venv', 'venv',
-                        '.env', '.env.*'
-                    ]
-                    
-                    # 如果源路径是当前目录，额外排除我们系统的文件
-                    if os.path.abspath(source_root) == current_dir:
-                        ignore_patterns.extend([
-                            'agent_repos', 'agent_repos/*',
-                            'src/multi_agent_coder*', 
-                            'test_*.py',
-                            'pyproject.toml',
-                            'uv.lock',
-                            'requirements.txt',
-                            '*.egg-info', '*.egg-info/*',
-                            'run.py',
-                            'test_startup.py'
-                        ])
+                        # 并发复制同样在工作线程中进行，不阻塞事件循环
+                        copied_files = await asyncio.to_thread(copy_scanned_tree, *scanned)
+                        logger.info(f"✅ 成功复制 {len(copied_files)} 个{project_name}文件到playground仓库")
                     
-                    # 检查是否匹配忽略模式
-                    for pattern in ignore_patterns:
-                        if fnmatch.fnmatch(name, pattern):
-                            return False
-                    
-                    return True
-                
-                # 执行复制
-                copied_files = 0
-                playground_path = playground_git_manager.repo_path
-                
-                for root, dirs, files in os.walk(source_path):
-                    # 过滤目录
-                    dirs[:] = [d for d in dirs if should_copy_file(root, d, source_path)]
-                    
-                    for file in files:
-                        if not should_copy_file(root, file, source_path):
-                            continue
-                        
-                        src_file = os.path.join(root, file)
-                        rel_path = os.path.relpath(src_file, source_path)
-                        dst_file = os.path.join(playground_path, rel_path)
-                        
-                        # 确保目标目录存在
-                        dst_dir = os.path.dirname(dst_file)
-                        if dst_dir:
-                            os.makedirs(dst_dir, exist_ok=True)
-                        
-                        try:
-                            shutil.copy2(src_file, dst_file)
-                            copied_files += 1
-                        except Exception as e:
-                            logger.warning(f"⚠️ 复制文件失败 {rel_path}: {e}")
+                        # 只提交刚复制的文件，git无需重新扫描整个工作区
+                        # （项目自带的 .gitignore 可能忽略其中一部分，显式添加前先去掉）
+                        return await playground_git_manager.filter_ignored(
+                            [os.path.relpath(path, playground_path) for path in copied_files]
+                        )
                 
-                logger.info(f"✅ 成功复制 {copied_files} 个{project_name}文件到playground仓库")
-                
-                # 提交复制的内容
-                if copied_files > 0:
-                    await playground_git_manager.commit_changes(
-                        f"复制{project_name}内容作为参考代码",
-                        ["."]
-                    )
-                
-            except Exception as e:
-                logger.error(f"❌ 复制用户项目内容失败: {e}")
-                logger.warning("⚠️ Agent将在没有参考代码的情况下工作")
+                except Exception as e:
+                    logger.error(f"❌ 复制用户项目内容失败: {e}")
+                    logger.warning("⚠️ Agent将在没有参考代码的情况下工作")
+                return []
             
-            # 🆕 关键步骤：确保playground仓库有Issues文件
-            logger.info("🔄 设置playground仓库的Issues文件...")
-            try:
-                # 检查playground仓库是否已有Issues文件
-                playground_issues_file = os.path.join(playground_git_manager.repo_path, ".issues.json")
-                
-                if not os.path.exists(playground_issues_file):
-                    # 创建空的Issues文件
-                    import json
-                    with open(playground_issues_file, 'w', encoding='utf-8') as f:
-                        json.dump({"issues": []}, f, indent=2, ensure_ascii=False)
-                    
-                    # 提交到playground仓库
+            # Issues文件初始化不依赖参考代码，与复制并发进行；
+            # 两者都完成后playground才是完整的，agent仓库要从它克隆，因此放在之后
+            async with asyncio.TaskGroup() as tg:
+                seed_task = tg.create_task(seed_playground())
+                issues_task = tg.create_task(ensure_playground_issues(playground_git_manager))
+            
+            # 参考代码和Issues文件合并为一次提交，只需一轮 git add + commit
+            files_to_commit = seed_task.result()
+            if issues_task.result():
+                files_to_commit.append(".issues.json")
+            if files_to_commit:
+                try:
                     await playground_git_manager.commit_changes(
-                        "初始化Issues文件",
-                        [".issues.json"]
+                        f"初始化playground: {project_name}参考代码 + Issues文件",
+                        files_to_commit
                     )
-                    
-                    logger.info("✅ 在playground仓库创建了Issues文件")
-                else:
-                    logger.info("✅ playground仓库已有Issues文件")
-                    
-            except Exception as e:
-                logger.error(f"❌ 设置playground仓库Issues文件失败: {e}")
+                except Exception as e:
+                    logger.error(f"❌ 提交playground初始内容失败: {e}")
             
             # 🆕 创建协作管理器（使用playground仓库作为主仓库，使用独立的LLM管理器）
-            collaboration_llm_manager = LLMManager(api_key, proxy_url=proxy_url)
+            collaboration_llm_manager = LLMManager(api_key, http_client=http_client, limiter=llm_limiter,
+                                                   circuit_breaker=llm_breaker)
             collaboration_manager = CollaborationManager(playground_git_manager, collaboration_llm_manager)
             logger.info("✅ 创建协作管理器")
             
             # 🆕 为Commenter创建独立的LLM管理器，避免并发竞争
-            commenter_llm_manager = LLMManager(api_key, proxy_url=proxy_url)
+            commenter_llm_manager = LLMManager(api_key, http_client=http_client, limiter=llm_limiter,
+                                               circuit_breaker=llm_breaker)
             # 创建评论员代理（使用playground仓库）
             commenter = CommenterAgent("commenter", playground_git_manager, commenter_llm_manager)
             commenter.set_collaboration_manager(collaboration_manager)
             
-            # 创建编码员代理（每个使用独立仓库和独立的LLM管理器）
-            coders = []
-            for i in range(config["system"]["num_coders"]):
+            # 创建编码员代理（每个使用独立仓库，共享同一个LLM管理器和连接池）
+            # LLMManager本身无请求状态，共享可避免为每个coder各建一套HTTP连接池
+            coder_llm_manager = LLMManager(api_key, http_client=http_client, limiter=llm_limiter,
+                                           circuit_breaker=llm_breaker)
+            # 限制同时实现中的Issue数量，避免超过LLM服务的RPM上限
+            issue_semaphore = asyncio.Semaphore(system_config["max_in_flight_issues"])
+            
+            async def make_coder(i: int) -> CoderAgent:
+                """为coder设置独立仓库并创建完整配置的CoderAgent"""
                 agent_id = f"coder_{i}"
-                # 为每个coder设置独立仓库
-                agent_git_manager = await multi_repo_manager.setup_agent_repo(agent_id)
+                agent_git_manager = await multi_repo_manager.setup_agent_repo(agent_id, collaboration_manager)
                 # 🆕 使用agent的独立工作目录，而不是用户原始项目路径
-                agent_work_path = agent_git_manager.repo_path
-                # 🆕 为每个coder创建独立的LLM管理器，避免并发竞争
-                coder_llm_manager = LLMManager(api_key, proxy_url=proxy_url)
-                coder = CoderAgent(f"coder_{i}", coder_llm_manager, agent_work_path)
-                # 设置playground仓库管理器，用于访问Issues
-                coder.set_playground_git_manager(playground_git_manager)
-                # 设置协作管理器，启用Pull Request流程
-                coder.set_collaboration_manager(collaboration_manager)
-                # 设置多仓库管理器，用于同步工作
-                coder.set_multi_repo_manager(multi_repo_manager)
-                coders.append(coder)
+                return CoderAgent(
+                    agent_id, coder_llm_manager, agent_git_manager.repo_path,
+                    issue_semaphore=issue_semaphore,
+                    playground_git_manager=playground_git_manager,  # 用于访问Issues
+                    collaboration_manager=collaboration_manager,    # 启用Pull Request流程
+                    multi_repo_manager=multi_repo_manager           # 用于同步工作
+                )
+            
+            # 各coder的独立仓库互不依赖，并发设置（并发数由 MultiRepoManager 的信号量限制）
+            async with asyncio.TaskGroup() as tg:
+                coder_tasks = [tg.create_task(make_coder(i)) for i in range(system_config["num_coders"])]
+            coders = [task.result() for task in coder_tasks]
             
             print(f"🎉 创建了 {len(coders)} 个编码员代理，每个都有独立仓库")
             print("🔄 启用Pull Request协作流程")
@@ -432,7 +864,7 @@ async def main():
             
             # 🆕 即使在单仓库模式下，也使用独立的playground仓库管理Issues
             # 这样可以避免在用户主目录创建.issues.json文件
-            multi_repo_manager = MultiRepoManager("", config["system"]["agent_repos_dir"])
+            multi_repo_manager = MultiRepoManager("", system_config["agent_repos_dir"])
             playground_git_manager = await multi_repo_manager.setup_playground_repo()
             
             # 🆕 使用用户指定的仓库路径
@@ -441,67 +873,79 @@ async def main():
             logger.info("💡 Issues将在独立的playground仓库中管理，不会影响您的项目目录")
             
             # 创建评论员代理（使用playground仓库管理Issues）
-            commenter_llm_manager = LLMManager(api_key, proxy_url=proxy_url)
+            commenter_llm_manager = LLMManager(api_key, http_client=http_client, limiter=llm_limiter,
+                                               circuit_breaker=llm_breaker)
             commenter = CommenterAgent("commenter", playground_git_manager, commenter_llm_manager)
             
-            # 创建编码员代理（每个使用独立的LLM管理器）
+            # 创建编码员代理（共享同一个LLM管理器和连接池）
+            coder_llm_manager = LLMManager(api_key, http_client=http_client, limiter=llm_limiter,
+                                           circuit_breaker=llm_breaker)
+            # 限制同时实现中的Issue数量，避免超过LLM服务的RPM上限
+            issue_semaphore = asyncio.Semaphore(system_config["max_in_flight_issues"])
             coders = []
-            for i in range(config["system"]["num_coders"]):
-                # 🆕 为每个coder创建独立的LLM管理器，避免并发竞争
-                coder_llm_manager = LLMManager(api_key, proxy_url=proxy_url)
+            for i in range(system_config["num_coders"]):
                 # 🆕 在单仓库模式下，使用用户指定的仓库路径，但通过playground管理Issues
-                coder = CoderAgent(f"coder_{i}", coder_llm_manager, user_repo_path)
-                # 设置playground仓库管理器，用于访问Issues
-                coder.set_playground_git_manager(playground_git_manager)
+                coder = CoderAgent(f"coder_{i}", coder_llm_manager, user_repo_path,
+                                   issue_semaphore=issue_semaphore,
+                                   playground_git_manager=playground_git_manager)  # 用于访问Issues
                 coders.append(coder)
         
-        # 启动所有代理
-        print("\n" + "=" * 60)
-        print("🚀 正在启动多智能体协作系统...")
-        print(f"📊 系统配置: 1个Commenter + {len(coders)}个Coder")
-        print(f"📁 工作仓库: {user_repo_path}")
-        print("⏳ 请稍等，系统正在初始化...")
-        print("=" * 60)
-        print()
-        
-        # 🆕 增加用户指导信息
-        print("💡 系统启动完成后，你可以:")
-        print("   1️⃣  查看日志文件: multi_agent_coder.log")
-        print("   2️⃣  检查工作成果: python check_agents_work.py")
-        print("   3️⃣  查看Memory记录: ls -la .memory/")
-        print("   4️⃣  查看工作报告: ls -la reports/ 或 agent_repos/playground/reports/")
-        print("   5️⃣  查看代码提交: cd agent_repos/playground && git log --oneline")
-        print("   6️⃣  使用 Ctrl+C 停止系统")
-        print()
-        print("🔍 实时监控AI Agents工作状态...")
-        print("⚠️  如果长时间没有输出，可能是网络问题或LLM API调用失败")
-        print("=" * 60)
-        print()
+        # 启动所有代理（横幅拼成一个字符串一次写出）
+        sys.stdout.write("\n".join([
+            "",
+            "=" * 60,
+            "🚀 正在启动多智能体协作系统...",
+            f"📊 系统配置: 1个Commenter + {len(coders)}个Coder",
+            f"📁 工作仓库: {user_repo_path}",
+            "⏳ 请稍等，系统正在初始化...",
+            "=" * 60,
+            "",
+            # 🆕 增加用户指导信息
+            "💡 系统启动完成后，你可以:",
+            "   1️⃣  查看日志文件: multi_agent_coder.log",
+            "   2️⃣  检查工作成果: python check_agents_work.py",
+            "   3️⃣  查看Memory记录: ls -la .memory/",
+            "   4️⃣  查看工作报告: ls -la reports/ 或 agent_repos/playground/reports/",
+            "   5️⃣  查看代码提交: cd agent_repos/playground && git log --oneline",
+            "   6️⃣  使用 Ctrl+C 停止系统",
+            "",
+            "🔍 实时监控AI Agents工作状态...",
+            "⚠️  如果长时间没有输出，可能是网络问题或LLM API调用失败",
+            "=" * 60,
+            "",
+        ]) + "\n")
+        sys.stdout.flush()
         
         # 设置日志级别，减少启动时的噪音
         logging.getLogger('src.multi_agent_coder.agents.coder').setLevel(logging.WARNING)
         logging.getLogger('src.multi_agent_coder.git_utils').setLevel(logging.WARNING)
         logging.getLogger('src.multi_agent_coder.multi_repo_manager').setLevel(logging.WARNING)
         
-        tasks = [
-            asyncio.create_task(commenter.run()),
-            *[asyncio.create_task(coder.run()) for coder in coders]
-        ]
-        
-        # 等待所有任务完成
-        await asyncio.gather(*tasks)
+        # 在TaskGroup中运行所有代理：Ctrl+C或取消时所有代理任务会被统一取消并等待结束
+        # 单个代理出错由 _run_agent 记录，不会让其他代理停止工作
+        async with asyncio.TaskGroup() as tg:
+            for agent in (commenter, *coders):
+                tg.create_task(_run_agent(agent))
         
     except Exception as e:
         logger.error(f"运行出错: {e}")
-        import traceback
         logger.error(f"🔍 错误详情:\n{traceback.format_exc()}")
     finally:
-        # 清理日志监听器
-        listener.stop()
+        # 关闭共享的HTTP客户端
+        if http_client is not None:
+            await http_client.aclose()
+        # 写出缓冲区中剩余的日志
+        file_handler.flush()
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        # 安装了 uvloop 时使用它的事件循环，否则使用 asyncio 默认事件循环
+        loop_factory = uvloop.new_event_loop if uvloop is not None else None
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            runner.run(main())
+    except KeyboardInterrupt:
+        # Ctrl+C：主任务已被取消并完成清理，不再打印回溯
+        pass
     finally:
-        # 确保日志监听器被正确关闭
-        listener.stop() 
\ No newline at end of file
+        # 确保缓冲区中剩余的日志被写出
+        file_handler.flush() 
\ No newline at end of file
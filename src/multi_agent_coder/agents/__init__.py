@@ -4,12 +4,31 @@ Agent 模块
 所有代理都支持异步操作
 """
 
-from .commenter import CommenterAgent
-from .coder import CoderAgent
-from .memory_manager import MemoryManager
+import importlib
+
+# 导出名称 -> 所在子模块；子模块在第一次访问对应名称时才导入（PEP 562）
+_LAZY_EXPORTS = {
+    'CommenterAgent': '.commenter',
+    'CoderAgent': '.coder',
+    'MemoryManager': '.memory_manager',
+    'SQLiteMemoryManager': '.memory_manager',
+}
 
 __all__ = [
-    'CommenterAgent', 
+    'CommenterAgent',
     'CoderAgent',
-    'MemoryManager'
-] 
\ No newline at end of file
+    'MemoryManager',
+    'SQLiteMemoryManager'
+]
+
+def __getattr__(name: str):
+    """按需导入导出的代理类，并缓存到模块命名空间中"""
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
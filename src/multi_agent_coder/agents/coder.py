@@ -7,21 +7,45 @@ memory只存储AI在写代码过程中的思考和决策链。
 import os
 import logging
 import asyncio
+import subprocess
+from datetime import datetime
 from typing import Any, Optional
+from .. import json_utils
+from ..config import SYSTEM_CONFIG
 from ..git_utils import GitManager
 from ..llm_utils import LLMManager
-from .memory_manager import MemoryManager
+from .memory_manager import MemoryManager, SQLiteMemoryManager
 
 logger = logging.getLogger(__name__)
 
+# 提交PR时收集的代码文件扩展名
+CODE_FILE_EXTENSIONS = ('.py', '.js', '.ts', '.html', '.css', '.json', '.md')
+# 收集代码时跳过的目录（另外所有隐藏目录都会跳过）
+SKIPPED_DIRS = frozenset({'__pycache__', 'node_modules', '.memory'})
+
 class CoderAgent:
     """
     极简、灵活、prompt驱动的编码员代理。
     所有开发任务都通过prompt驱动LLM完成。
     memory只存储AI在写代码过程中的思考和决策链。
     """
+    
+    # 等待Issues变化的最长时间（秒），超时后重新检查一次，兜底感知其他进程对Issues文件的修改
+    ISSUE_WATCH_TIMEOUT = 30
+    
+    # Issue实现失败后的退避时间（秒）：连续失败时按指数增长，直到上限
+    FAILURE_BACKOFF_BASE = 10
+    FAILURE_BACKOFF_MAX = 300
+    
+    # 日志中patch内容预览的行数
+    PATCH_PREVIEW_LINES = 10
+    
     def __init__(self, agent_id: str, llm_manager: Any, user_project_path: str,
-                 memory_manager: Optional[MemoryManager] = None):
+                 memory_manager: Optional[MemoryManager] = None,
+                 issue_semaphore: Optional[asyncio.Semaphore] = None,
+                 *, playground_git_manager: Optional[GitManager] = None,
+                 collaboration_manager: Any = None,
+                 multi_repo_manager: Any = None):
         """初始化代码实现代理
         
         Args:
@@ -29,17 +53,28 @@ class CoderAgent:
             llm_manager: LLM管理器
             user_project_path: 用户项目路径
             memory_manager: 记忆管理器，可选
+            issue_semaphore: 所有coder共享的信号量，限制同时实现中的Issue数量，可选
+            playground_git_manager: playground仓库管理器，用于访问Issues，可选
+            collaboration_manager: 协作管理器，启用Pull Request流程，可选
+            multi_repo_manager: 多仓库管理器，用于同步工作，可选
         """
         self.agent_id = agent_id
         self.llm_manager = llm_manager
         self.user_project_path = user_project_path
+        self.issue_semaphore = issue_semaphore
+        self.playground_git_manager = playground_git_manager
+        self.collaboration_manager = collaboration_manager
+        self.multi_repo_manager = multi_repo_manager
         # 注意：Issues管理通过playground_git_manager完成，不在用户项目目录中创建GitManager
         
         # 初始化记忆管理器
         if memory_manager is None:
             # 使用项目根目录下的.memory目录
             memory_dir = os.path.join(os.getcwd(), ".memory")
-            self.memory_manager = MemoryManager(agent_id, memory_dir)
+            if SYSTEM_CONFIG["memory_backend"] == "sqlite":
+                self.memory_manager = SQLiteMemoryManager(agent_id, memory_dir)
+            else:
+                self.memory_manager = MemoryManager(agent_id, memory_dir)
         else:
             self.memory_manager = memory_manager
         
@@ -90,6 +125,9 @@ class CoderAgent:
         await self.memory_manager.record_task_start_thinking(self.llm_manager, issue)
         
         while iteration_count < max_iterations:
+            # 持久化上一轮迭代积累的记忆（在 memory_manager.batch() 中时）
+            self.memory_manager.flush()
+            
             # 获取格式化的记忆
             memories_text = self.get_formatted_memories()
             
@@ -256,7 +294,7 @@ patch main.py < fix.patch
                         break
                     
                     logger.info(f"🔧 执行命令 {i}/{len(commands)}: {cmd}")
-                    cmd_result = self._execute_action(cmd)
+                    cmd_result = await asyncio.to_thread(self._execute_action, cmd)
                     all_results.append(f"命令{i} ({cmd}):\n{cmd_result}")
                     
                     # 如果是patch命令且失败了，停止后续命令
@@ -279,7 +317,7 @@ patch main.py < fix.patch
                 
             # 执行动作
             logger.info(f"🔧 开始执行动作: {action}")
-            return_value = self._execute_action(action)
+            return_value = await asyncio.to_thread(self._execute_action, action)
             
             # 增加执行结果日志
             if return_value:
@@ -311,14 +349,15 @@ patch main.py < fix.patch
             # 智能完成检查 - 结合思考能力和实际文件操作
             if iteration_count > 8:  # 给足够时间进行探索、分析和修改
                 # 检查是否有实际的文件修改操作（创建patch文件或应用patch）
-                has_file_operations = any("成功创建patch文件" in memory or "patch" in memory for memory in self.long_term_memories[-10:])
+                # （"成功创建patch文件" 本身也包含 "patch"，检查 "patch" 即可）
+                has_file_operations = any("patch" in memory for memory in self.long_term_memories[-10:])
                 
                 if has_file_operations:
-                    # 检查最近是否创建了patch文件
-                    recent_patch_creations = [memory for memory in self.long_term_memories[-5:] if "成功创建patch文件" in memory]
+                    # 检查最近是否创建了patch文件，找到一条即可停止扫描
+                    has_recent_patch_creation = any("成功创建patch文件" in memory for memory in self.long_term_memories[-5:])
                     
                     # 如果最近创建了patch文件，更严格地检查任务完成情况
-                    if recent_patch_creations:
+                    if has_recent_patch_creation:
                         completion_check = await self.llm_manager._call_llm(f"""
 检查任务完成情况：
 
@@ -379,10 +418,11 @@ patch main.py < fix.patch
 
     
     def _execute_action(self, action: str) -> str:
-        """执行动作命令 - 支持文件修改和终端执行"""
+        """执行动作命令 - 支持文件修改和终端执行
+
+        内部使用阻塞的 subprocess.run（最长60秒），调用方需通过 asyncio.to_thread 在工作线程中执行。
+        """
         try:
-            import subprocess
-            
             # 清理action，移除可能的markdown格式
             action = action.strip()
             if action.startswith("```") and action.endswith("```"):
@@ -410,7 +450,6 @@ patch main.py < fix.patch
             
             # 执行命令
             logger.info(f"⏳ 开始执行命令...")
-            import subprocess
             result = subprocess.run(
                 action, 
                 shell=True, 
@@ -502,17 +541,21 @@ patch main.py < fix.patch
             logger.info(f"📝 准备创建patch文件: {patch_filename}")
             logger.info(f"📄 patch内容长度: {len(patch_content)}字符")
             
-            # 显示patch内容
-            logger.info(f"📖 patch内容: {patch_content}")
+            # 显示patch内容预览：直接取已解析出的前几行，不把整个patch写进日志
+            preview = '\n'.join(content_lines[:self.PATCH_PREVIEW_LINES])
+            logger.info(f"📖 patch内容预览 (前{self.PATCH_PREVIEW_LINES}行):\n{preview}")
+            if len(content_lines) > self.PATCH_PREVIEW_LINES:
+                logger.info(f"   ... (还有 {len(content_lines) - self.PATCH_PREVIEW_LINES} 行)")
             
             # 确保目录存在
             os.makedirs(os.path.dirname(patch_path), exist_ok=True)
             
-            # 写入patch文件
-            with open(patch_path, 'w', encoding='utf-8') as f:
-                f.write(patch_content)
+            # 写入patch文件：只编码一次，直接以二进制写入，跳过文本层的逐块编码
+            patch_bytes = patch_content.encode('utf-8')
+            with open(patch_path, 'wb') as f:
+                f.write(patch_bytes)
             
-            logger.info(f"✅ 成功创建patch文件: {patch_filename}")
+            logger.info(f"✅ 成功创建patch文件: {patch_filename} ({len(patch_bytes)}字节)")
             return f"✅ 成功创建patch文件: {patch_filename} (内容长度: {len(patch_content)}字符)"
                 
         except Exception as e:
@@ -591,6 +634,14 @@ patch main.py < fix.patch
                 "short_term_memory": self.short_term_memory
             }
     
+    async def _implement_issue_bounded(self, issue: dict) -> dict:
+        """在并发上限内实现Issue，避免所有coder同时压向LLM服务触发限流"""
+        if self.issue_semaphore is None:
+            return await self.implement_issue(issue)
+        
+        async with self.issue_semaphore:
+            return await self.implement_issue(issue)
+    
     def get_memory_summary(self) -> dict:
         """获取记忆总结"""
         return {
@@ -603,16 +654,15 @@ patch main.py < fix.patch
     def export_memories(self, output_path: str) -> bool:
         """导出记忆到文件"""
         try:
-            import json
             memory_data = {
                 "agent_id": self.agent_id,
                 "long_term_memories": self.long_term_memories,
                 "short_term_memory": self.short_term_memory,
-                "export_time": str(asyncio.get_event_loop().time())
+                "export_time": datetime.now().isoformat()
             }
             
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(memory_data, f, ensure_ascii=False, indent=2)
+            with open(output_path, 'wb') as f:
+                f.write(json_utils.dumps(memory_data, indent=True))
             
             return True
         except Exception as e:
@@ -622,9 +672,8 @@ patch main.py < fix.patch
     def load_memories(self, input_path: str) -> bool:
         """从文件加载记忆"""
         try:
-            import json
-            content = self._read_file_with_encoding(input_path)
-            memory_data = json.loads(content)
+            with open(input_path, 'rb') as f:
+                memory_data = json_utils.loads(f.read())
             
             self.long_term_memories = memory_data.get("long_term_memories", [])
             self.short_term_memory = memory_data.get("short_term_memory", "")
@@ -685,12 +734,7 @@ patch main.py < fix.patch
                 
                 logger.info(f"✨ 创建Pull Request: #{pr_id}")
                 self.add_long_term_memory(f"创建Pull Request: #{pr_id} 用于Issue: {issue_title}")
-                
-                # 注册agent仓库到协作管理器
-                if hasattr(self, 'multi_repo_manager'):
-                    agent_git_manager = self.multi_repo_manager.get_agent_git_manager(self.agent_id)
-                    if agent_git_manager:
-                        self.collaboration_manager.register_agent_repo(self.agent_id, agent_git_manager)
+
             else:
                 logger.info("📝 没有代码更改，跳过创建Pull Request")
             
@@ -699,31 +743,39 @@ patch main.py < fix.patch
             self.add_long_term_memory(f"创建Pull Request失败: {e}")
     
     def _read_file_with_encoding(self, file_path: str) -> str:
-        """尝试用多种编码读取文件"""
+        """尝试用多种编码读取文件
+        
+        文件只读取一次，各种编码都在内存中对同一份字节尝试解码。
+        """
         encodings = ['utf-8', 'utf-16', 'utf-16-le', 'utf-16-be', 'latin-1', 'gbk', 'cp1252']
         
+        try:
+            with open(file_path, 'rb') as f:
+                data = f.read()
+        except Exception as e:
+            logger.error(f"无法读取文件 {file_path}: {e}")
+            return ""
+        
         for encoding in encodings:
             try:
-                with open(file_path, 'r', encoding=encoding) as f:
-                    content = f.read()
-                    # 检查内容是否合理（不包含太多控制字符）
-                    if self._is_text_content(content):
-                        return content
+                content = self._decode_text(data, encoding)
             except (UnicodeDecodeError, UnicodeError):
                 continue
-            except Exception as e:
-                logger.debug(f"尝试编码 {encoding} 读取文件 {file_path} 失败: {e}")
-                continue
-        
-        # 如果所有编码都失败，尝试以二进制方式读取并忽略错误
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-                logger.warning(f"文件 {file_path} 使用UTF-8编码读取时忽略了一些字符")
+            # 检查内容是否合理（不包含太多控制字符）
+            if self._is_text_content(content):
                 return content
-        except Exception as e:
-            logger.error(f"无法读取文件 {file_path}: {e}")
-            return ""
+        
+        # 如果所有编码都失败，以UTF-8解码并忽略错误
+        logger.warning(f"文件 {file_path} 使用UTF-8编码读取时忽略了一些字符")
+        return self._decode_text(data, 'utf-8', errors='ignore')
+    
+    @staticmethod
+    def _decode_text(data: bytes, encoding: str, errors: str = 'strict') -> str:
+        """解码字节内容，并像文本模式打开文件一样统一换行符"""
+        content = data.decode(encoding, errors)
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        return content
     
     def _is_text_content(self, content: str) -> bool:
         """检查内容是否是合理的文本内容"""
@@ -740,33 +792,45 @@ patch main.py < fix.patch
         
         return True
 
+    def _iter_code_files(self, root: str):
+        """基于 os.scandir 递归遍历代码文件，跳过隐藏目录和特殊目录"""
+        try:
+            with os.scandir(root) as it:
+                entries = list(it)
+        except OSError as e:
+            logger.warning(f"遍历目录失败 {root}: {e}")
+            return
+        
+        for entry in entries:
+            name = entry.name
+            if name.startswith('.'):
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                if name not in SKIPPED_DIRS:
+                    yield from self._iter_code_files(entry.path)
+            elif (name.endswith(CODE_FILE_EXTENSIONS) and
+                  not name.startswith('agent_')):
+                # 过滤掉agent工作文件和临时文件
+                yield entry.path
+    
     async def _get_code_changes(self) -> dict[str, str]:
         """获取代码更改"""
         try:
-            code_changes = {}
+            file_paths = await asyncio.to_thread(lambda: list(self._iter_code_files(self.user_project_path)))
             
-            # 获取当前工作目录中的所有相关文件
-            for root, dirs, files in os.walk(self.user_project_path):
-                # 跳过隐藏目录和特殊目录
-                dirs[:] = [d for d in dirs if not d.startswith('.') and d not in ['__pycache__', 'node_modules', '.memory']]
-                
-                for file in files:
-                    # 过滤掉agent工作文件和临时文件
-                    if (file.endswith(('.py', '.js', '.ts', '.html', '.css', '.json', '.md')) and 
-                        not file.startswith('agent_') and 
-                        not file.startswith('.') and
-                        file not in ['.issues.json', '.pull_requests.json']):
-                        
-                        file_path = os.path.join(root, file)
-                        rel_path = os.path.relpath(file_path, self.user_project_path)
-                        
-                        try:
-                            # 尝试多种编码方式读取文件
-                            content = self._read_file_with_encoding(file_path)
-                            if content and content.strip():  # 只包含非空文件
-                                code_changes[rel_path] = content
-                        except Exception as e:
-                            logger.warning(f"读取文件失败 {rel_path}: {e}")
+            # 在线程池中并发读取文件，避免阻塞事件循环
+            results = await asyncio.gather(
+                *(asyncio.to_thread(self._read_file_with_encoding, file_path) for file_path in file_paths),
+                return_exceptions=True
+            )
+            
+            code_changes = {}
+            for file_path, content in zip(file_paths, results):
+                rel_path = os.path.relpath(file_path, self.user_project_path)
+                if isinstance(content, Exception):
+                    logger.warning(f"读取文件失败 {rel_path}: {content}")
+                elif content and content.strip():  # 只包含非空文件
+                    code_changes[rel_path] = content
             
             return code_changes
             
@@ -777,7 +841,7 @@ patch main.py < fix.patch
     async def _sync_work_to_playground(self) -> None:
         """同步工作到playground仓库"""
         try:
-            if hasattr(self, 'multi_repo_manager'):
+            if self.multi_repo_manager is not None:
                 success = await self.multi_repo_manager.sync_agent_work_to_playground(self.agent_id)
                 if success:
                     logger.info(f"✅ 成功同步工作到playground")
@@ -789,6 +853,17 @@ patch main.py < fix.patch
             logger.error(f"❌ 同步工作失败: {e}")
             self.add_long_term_memory(f"同步工作失败: {e}")
     
+    async def _wait_for_issue_changes(self) -> None:
+        """等待新的Issues
+        
+        有playground时等待其Issues变化通知，最多等待 ISSUE_WATCH_TIMEOUT 秒（兜底感知外部修改）；
+        否则按固定间隔轮询。
+        """
+        if self.playground_git_manager is not None:
+            await self.playground_git_manager.wait_for_issues_change(self.ISSUE_WATCH_TIMEOUT)
+        else:
+            await asyncio.sleep(10)  # 每10秒检查一次新Issues
+    
     async def run(self):
         """运行CoderAgent的主循环 - 支持Issue抢夺"""
         logger.info(f"🚀 CoderAgent {self.agent_id} 开始运行")
@@ -797,20 +872,20 @@ patch main.py < fix.patch
             # 记录开始运行
             self.add_long_term_memory(f"🚀 开始运行 CoderAgent")
             
+            # 连续以实现失败结束的轮数，用于计算退避时间
+            failure_streak = 0
+            
             # 持续监控和抢夺Issues
             while True:
+                completed_any = False
+                failed_any = False
                 try:
                     # 检查是否有Issues需要处理
-                    if hasattr(self, 'playground_git_manager'):
+                    if self.playground_git_manager is not None:
                         issues_file = os.path.join(self.playground_git_manager.repo_path, ".issues.json")
                         if os.path.exists(issues_file):
-                            import json
-                            content = self._read_file_with_encoding(issues_file)
-                            issues_data = json.loads(content)
-                            
-                            # 获取所有open状态的Issues
-                            open_issues = [issue for issue in issues_data.get('issues', []) 
-                                         if issue.get('status') == 'open']
+                            # 获取所有open状态的Issues（所有coder共享playground的缓存，文件未变化时不重新解析）
+                            open_issues = self.playground_git_manager.get_open_issues_cached()
                             
                             if open_issues:
                                 logger.info(f"📋 发现 {len(open_issues)} 个待抢夺Issues")
@@ -820,57 +895,60 @@ patch main.py < fix.patch
                                 max_issues_per_agent = 3  # 每个agent最多处理3个issue
                                 issues_processed = 0
                                 
-                                for issue in open_issues:
+                                # 每次原子地认领一个Issue，最多尝试本轮发现的数量，避免失败后重新开放的Issue被反复认领
+                                for _ in range(len(open_issues)):
                                     if issues_processed >= max_issues_per_agent:
                                         break
-                                        
+                                    
+                                    issue = await self.playground_git_manager.claim_next_open_issue(self.agent_id)
+                                    if issue is None:
+                                        logger.info("❌ 没有可抢夺的Issue (可能已被其他agent抢夺)")
+                                        break
+                                    
                                     issue_id = issue.get('id')
                                     issue_title = issue.get('title', '未知')
                                     
-                                    logger.info(f"🔥 尝试抢夺Issue: {issue_title}")
+                                    # 本Issue处理过程中产生的记忆批量持久化：每轮实现迭代和每个处理阶段结束时写入一次
+                                    with self.memory_manager.batch():
+                                        logger.info(f"✅ 成功抢夺Issue: {issue_title}")
+                                        self.add_long_term_memory(f"🔥 成功抢夺Issue: {issue_title}")
+                                        self.memory_manager.store_memory(f"成功抢夺Issue: {issue_title}")
                                     
-                                    # 尝试分配Issue给自己
-                                    if hasattr(self, 'playground_git_manager'):
-                                        success = await self.playground_git_manager.assign_issue(issue_id, self.agent_id)
+                                        # 实现Issue（受全局并发上限约束）
+                                        result = await self._implement_issue_bounded(issue)
+                                        self.memory_manager.flush()
+                                    
+                                        # 安全地检查result格式
+                                        if isinstance(result, dict) and result.get("success", False):
+                                            logger.info(f"✅ Issue {issue_title} 实现成功")
+                                            self.memory_manager.store_memory(f"Issue {issue_title} 实现成功")
+                                        
+                                            # 创建Pull Request
+                                            if self.collaboration_manager is not None and self.multi_repo_manager is not None:
+                                                await self._create_pull_request_for_issue(issue, result)
                                         
-                                        if success:
-                                            logger.info(f"✅ 成功抢夺Issue: {issue_title}")
-                                            self.add_long_term_memory(f"🔥 成功抢夺Issue: {issue_title}")
-                                            self.memory_manager.store_memory(f"成功抢夺Issue: {issue_title}")
-                                            
-                                            # 实现Issue
-                                            result = await self.implement_issue(issue)
-                                            
-                                            # 安全地检查result格式
-                                            if isinstance(result, dict) and result.get("success", False):
-                                                logger.info(f"✅ Issue {issue_title} 实现成功")
-                                                self.memory_manager.store_memory(f"Issue {issue_title} 实现成功")
-                                                
-                                                # 创建Pull Request
-                                                if hasattr(self, 'collaboration_manager') and hasattr(self, 'multi_repo_manager'):
-                                                    await self._create_pull_request_for_issue(issue, result)
-                                                
-                                                # 同步代码到playground
-                                                if hasattr(self, 'multi_repo_manager'):
-                                                    await self._sync_work_to_playground()
-                                                
-                                                # 更新Issue状态为completed
-                                                await self.playground_git_manager.update_issue_status(
-                                                    issue_id, "completed", "实现完成"
-                                                )
-                                                
-                                                issues_processed += 1
-                                            else:
-                                                error_msg = result.get('error', '未知错误') if isinstance(result, dict) else str(result)
-                                                logger.error(f"❌ Issue {issue_title} 实现失败: {error_msg}")
-                                                self.memory_manager.store_memory(f"Issue {issue_title} 实现失败")
-                                                # 重新释放Issue，不要提交"实现失败"作为代码
-                                                await self.playground_git_manager.update_issue_status(
-                                                    issue_id, "open", None
-                                                )
+                                            # 同步代码到playground
+                                            if self.multi_repo_manager is not None:
+                                                await self._sync_work_to_playground()
+                                        
+                                            # 更新Issue状态为completed
+                                            await self.playground_git_manager.update_issue_status(
+                                                issue_id, "completed", "实现完成"
+                                            )
+                                        
+                                            issues_processed += 1
+                                            completed_any = True
                                         else:
-                                            logger.info(f"❌ 抢夺Issue失败: {issue_title} (可能已被其他agent抢夺)")
-                                            self.add_long_term_memory(f"❌ 抢夺失败: {issue_title}")
+                                            error_msg = result.get('error', '未知错误') if isinstance(result, dict) else str(result)
+                                            logger.error(f"❌ Issue {issue_title} 实现失败: {error_msg}")
+                                            self.memory_manager.store_memory(f"Issue {issue_title} 实现失败")
+                                            # 重新释放Issue，不要提交"实现失败"作为代码
+                                            await self.playground_git_manager.update_issue_status(
+                                                issue_id, "open", None
+                                            )
+                                            # 结束本轮，否则下一次认领可能立刻拿回刚重新开放的同一个Issue
+                                            failed_any = True
+                                            break
                                 
                                 if issues_processed > 0:
                                     logger.info(f"🎯 本轮处理了 {issues_processed} 个Issues")
@@ -882,8 +960,17 @@ patch main.py < fix.patch
                     else:
                         logger.info("📝 单仓库模式，等待手动任务分配")
                     
-                    # 等待一段时间后继续抢夺
-                    await asyncio.sleep(10)  # 每10秒检查一次新Issues
+                    # 本轮完成了Issue时立即再检查（可能还有剩余）；实现失败时退避，
+                    # 避免快速失败（如LLM不可用）时反复认领、失败、重新开放同一个Issue；否则等到Issues变化再抢夺
+                    if completed_any:
+                        failure_streak = 0
+                    elif failed_any:
+                        failure_streak += 1
+                        delay = min(self.FAILURE_BACKOFF_BASE * 2 ** (failure_streak - 1), self.FAILURE_BACKOFF_MAX)
+                        logger.info(f"⏳ Issue实现失败，{delay} 秒后再抢夺")
+                        await asyncio.sleep(delay)
+                    else:
+                        await self._wait_for_issue_changes()
                 except Exception as e:
                     logger.error(f"❌ 抢夺Issues过程中出错: {str(e)}")
                     self.add_long_term_memory(f"❌ 抢夺过程出错: {str(e)}")
@@ -8,6 +8,7 @@ import re
 import time
 import asyncio
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Optional
 from ..git_utils import GitManager
 from ..llm_utils import LLMManager
@@ -18,6 +19,12 @@ logger = logging.getLogger(__name__)
 class CommenterAgent:
     """评论员代理类"""
     
+    # 代码提交短于该长度（如"实现完成"之类的状态说明）时不值得调用LLM审查
+    MIN_SUBMISSION_LEN = 10
+    
+    # 日志中代码预览的行数
+    PREVIEW_LINES = 5
+    
     def __init__(self, agent_id: str, git_manager: GitManager, llm_manager: LLMManager):
         """初始化评论员代理
         
@@ -91,6 +98,19 @@ Created: {created}
         logger.info(f"创建 Issue: {title}")
         return issue
     
+    async def create_issues(self, items: list[tuple[str, str]]) -> list[dict[str, Any]]:
+        """批量创建 Issue（一次写入、一次提交）
+        
+        Args:
+            items: (标题, 描述) 列表
+            
+        Returns:
+            Issue 信息字典列表
+        """
+        issues = await self.git_manager.create_issues(items)
+        logger.info(f"批量创建 {len(issues)} 个 Issue")
+        return issues
+    
     async def analyze_requirements(self, requirements: str) -> None:
         """分析用户需求，创建 Issue
         
@@ -98,15 +118,16 @@ Created: {created}
             requirements: 用户需求描述
         """
         issues = await self.llm_manager.analyze_requirements(requirements)
-        for issue in issues:
-            await self.create_issue(issue["title"], issue["description"])
+        await self.create_issues([(issue["title"], issue["description"]) for issue in issues])
     
-    async def review_code(self, issue_id: str, code_changes: dict[str, Any]) -> bool:
+    async def review_code(self, issue_id: str, code_changes: dict[str, Any],
+                          issue: Optional[dict[str, Any]] = None) -> bool:
         """审查代码提交
         
         Args:
             issue_id: Issue ID
             code_changes: 代码更改信息
+            issue: 调用方已持有的 Issue 信息（提供时不再重新读取Issues文件）
             
         Returns:
             是否通过审查
@@ -114,26 +135,29 @@ Created: {created}
         logger.info(f"👀 开始审查Issue: {issue_id}")
         
         # 获取 Issue 信息
-        issues = await self.git_manager.get_open_issues()
-        issue = next((i for i in issues if i["id"] == issue_id), None)
+        if issue is None:
+            issues = await self.git_manager.get_open_issues()
+            issue = next((i for i in issues if i["id"] == issue_id), None)
         if not issue:
             logger.error(f"❌ 未找到Issue: {issue_id}")
             return False
         
+        code = code_changes['code']
         logger.info(f"📋 审查Issue详情: {issue.get('title', 'Unknown')}")
-        logger.info(f"📝 代码长度: {len(code_changes['code'])} 字符")
+        logger.info(f"📝 代码长度: {len(code)} 字符")
         
-        # 显示代码预览
-        code_lines = code_changes['code'].split('\n')
-        logger.info(f"🔍 代码预览 (前5行):")
-        for i, line in enumerate(code_lines[:5], 1):
+        # 显示代码预览：只切出前几行，不把整段代码拆成行列表
+        preview_lines = code.split('\n', self.PREVIEW_LINES)[:self.PREVIEW_LINES]
+        logger.info(f"🔍 代码预览 (前{self.PREVIEW_LINES}行):")
+        for i, line in enumerate(preview_lines, 1):
             logger.info(f"  {i}: {line}")
-        if len(code_lines) > 5:
-            logger.info(f"  ... (还有 {len(code_lines) - 5} 行)")
+        remaining_lines = code.count('\n') + 1 - self.PREVIEW_LINES
+        if remaining_lines > 0:
+            logger.info(f"  ... (还有 {remaining_lines} 行)")
         
         # 审查代码
         logger.info(f"🤖 开始LLM代码审查...")
-        review_result = await self.llm_manager.review_code(issue, code_changes["code"])
+        review_result = await self.llm_manager.review_code(issue, code)
         
         logger.info(f"📊 审查结果: {'通过' if review_result.get('approved', False) else '未通过'}")
         logger.info(f"💬 审查评论: {review_result.get('comments', 'No comments')}")
@@ -184,10 +208,6 @@ Created: {created}
         # 创建异步任务处理用户输入
         async def handle_user_input():
             """处理用户输入的异步任务"""
-            import sys
-            import asyncio
-            from concurrent.futures import ThreadPoolExecutor
-            
             def get_user_input_sync(prompt):
                 """同步获取用户输入"""
                 try:
@@ -209,7 +229,7 @@ Created: {created}
                     print("🔥" * 50)
                     
                     # 在单独的线程中获取用户输入，避免阻塞异步事件循环
-                    loop = asyncio.get_event_loop()
+                    loop = asyncio.get_running_loop()
                     user_input = await loop.run_in_executor(
                         executor, 
                         get_user_input_sync, 
@@ -304,19 +324,18 @@ Created: {created}
                     comments = ""
                     
                     try:
-                        # 使用LLM审查代码
-                        for file_path, code_content in pr.code_changes.items():
-                            logger.info(f"📁 审查文件: {file_path}")
-                            
-                            # 构造Issue信息用于审查
-                            issue_info = {
-                                "id": pr.issue_id,
-                                "title": pr.title,
-                                "description": pr.description
-                            }
-                            
-                            review_result = await self.llm_manager.review_code(issue_info, code_content)
-                            
+                        # 构造Issue信息用于审查
+                        issue_info = {
+                            "id": pr.issue_id,
+                            "title": pr.title,
+                            "description": pr.description
+                        }
+                        
+                        # 使用LLM批量审查代码，多个文件合并到同一次调用中
+                        logger.info(f"📁 审查文件: {', '.join(pr.code_changes)}")
+                        review_results = await self.llm_manager.review_code_batch(issue_info, pr.code_changes)
+                        
+                        for file_path, review_result in review_results.items():
                             if not review_result["approved"]:
                                 approved = False
                                 comments += f"文件 {file_path}: {review_result.get('comments', 'Code quality issues')}\n"
@@ -367,12 +386,14 @@ Created: {created}
                 
                 for issue in issues:
                     logger.debug(f"🔍 检查Issue: {issue.get('title', 'Unknown')}")
-                    if issue.get("code_submission"):
+                    code_submission = issue.get("code_submission")
+                    if code_submission and len(code_submission) > self.MIN_SUBMISSION_LEN:
                         logger.info(f"💻 发现代码提交，开始审查Issue: {issue['id']}")
-                        # 审查代码提交
+                        # 审查代码提交（直接传入已读取的Issue，无需再次读取Issues文件）
                         await self.review_code(
                             issue["id"],
-                            {"code": issue["code_submission"]}
+                            {"code": code_submission},
+                            issue
                         )
                     else:
                         logger.debug(f"⏳ Issue {issue['id']} 还没有代码提交")
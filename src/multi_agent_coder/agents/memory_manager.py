@@ -5,6 +5,11 @@
 
 import os
 import time
+import heapq
+import contextlib
+import functools
+import sqlite3
+import threading
 from pathlib import Path
 from dataclasses import dataclass, field
 from typing import Any, Optional, List, Dict
@@ -14,6 +19,26 @@ import re
 
 logger = logging.getLogger(__name__)
 
+# 记忆文件中使用的时间格式
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+@functools.lru_cache(maxsize=1024)
+def _compile_query(query: str) -> Optional[re.Pattern]:
+    """把查询关键词编译成一个忽略大小写的正则，匹配任意一个关键词即可
+    
+    同样的查询会被反复使用，编译结果按查询字符串缓存。
+    
+    Args:
+        query: 查询关键词，以空白分隔
+        
+    Returns:
+        编译后的正则；没有关键词时返回 None
+    """
+    query_words = query.split()
+    if not query_words:
+        return None
+    return re.compile("|".join(map(re.escape, query_words)), re.IGNORECASE)
+
 @dataclass
 class Memory:
     """简化的记忆数据结构"""
@@ -22,7 +47,7 @@ class Memory:
     
     def to_text_line(self) -> str:
         """转换为文本行格式"""
-        timestamp = self.create_at.strftime('%Y-%m-%d %H:%M:%S')
+        timestamp = self.create_at.strftime(TIMESTAMP_FORMAT)
         return f"[{timestamp}] {self.context}"
     
     @classmethod
@@ -34,7 +59,7 @@ class Memory:
             try:
                 timestamp_str = match.group(1)
                 context = match.group(2)
-                create_at = datetime.strptime(timestamp_str, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+                create_at = datetime.strptime(timestamp_str, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
                 return cls(create_at=create_at, context=context)
             except ValueError:
                 logger.warning(f"无法解析时间戳: {line}")
@@ -52,6 +77,7 @@ class MemoryManager:
         self.memories: List[Memory] = []
         self.max_memories = 500  # 最大记忆数量
         self.max_memory_age_days = 30  # 记忆最大保存天数
+        self._pending_memories: Optional[List[Memory]] = None  # batch() 中尚未持久化的记忆
         
         # 加载现有记忆
         self._load_memories()
@@ -87,7 +113,7 @@ class MemoryManager:
             with open(self.memory_file, 'w', encoding='utf-8') as f:
                 # 写入文件头
                 f.write(f"=== Agent: {self.agent_id} ===\n")
-                f.write(f"Last Updated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+                f.write(f"Last Updated: {datetime.now().strftime(TIMESTAMP_FORMAT)}\n")
                 f.write(f"Total Memories: {len(self.memories)}\n")
                 f.write("\n")
                 
@@ -115,24 +141,84 @@ class MemoryManager:
         Args:
             context: 记忆内容（自然语言描述）
         """
-        if not context or not context.strip():
-            logger.warning("记忆内容为空，跳过存储")
+        self.store_memories([context])
+    
+    def _new_memories(self, contexts: List[str]) -> List[Memory]:
+        """为非空的记忆内容创建记忆对象，共用同一个创建时间
+        
+        Args:
+            contexts: 记忆内容列表
+            
+        Returns:
+            新记忆列表
+        """
+        now = datetime.now(timezone.utc)
+        memories = [Memory(create_at=now, context=context.strip())
+                    for context in contexts if context and context.strip()]
+        if len(memories) < len(contexts):
+            logger.warning(f"跳过 {len(contexts) - len(memories)} 条空记忆")
+        return memories
+    
+    def store_memories(self, contexts: List[str]) -> None:
+        """批量存储多条记忆，清理和保存只进行一次
+        
+        在 batch() 中调用时，新记忆立即可被检索，持久化推迟到批次结束时统一进行。
+        
+        Args:
+            contexts: 记忆内容列表（自然语言描述）
+        """
+        memories = self._new_memories(contexts)
+        if not memories:
             return
         
-        memory = Memory(
-            create_at=datetime.now(timezone.utc),
-            context=context.strip()
-        )
+        self.memories.extend(memories)
+        if self._pending_memories is not None:
+            self._pending_memories.extend(memories)
+            return
         
-        self.memories.append(memory)
+        self._persist_memories(memories)
+        logger.debug(f"存储 {len(memories)} 条新记忆: {memories[0].context[:50]}...")
+    
+    def _persist_memories(self, memories: List[Memory]) -> None:
+        """持久化已加入内存的新记忆
         
+        Args:
+            memories: 新增的记忆
+        """
         # 清理过期和超量记忆
         self._cleanup_memories()
         
         # 保存到文件
         self._save_memories()
+    
+    @contextlib.contextmanager
+    def batch(self):
+        """批量写入上下文：期间存储的记忆在退出时一次性持久化
         
-        logger.debug(f"存储新记忆: {context[:50]}...")
+        嵌套使用时只有最外层在退出时持久化。
+        """
+        if self._pending_memories is not None:
+            yield self
+            return
+        self._pending_memories = []
+        try:
+            yield self
+        finally:
+            pending, self._pending_memories = self._pending_memories, None
+            if pending:
+                self._persist_memories(pending)
+                logger.debug(f"批量存储 {len(pending)} 条新记忆")
+    
+    def flush(self) -> None:
+        """立即持久化 batch() 中已积累的记忆，批次本身继续有效；不在批次中时什么也不做
+        
+        长时间的批次应在自然的阶段边界调用，缩小进程被终止时丢失记忆的范围。
+        """
+        if not self._pending_memories:
+            return
+        pending, self._pending_memories = self._pending_memories, []
+        self._persist_memories(pending)
+        logger.debug(f"批量存储 {len(pending)} 条新记忆")
     
     def _cleanup_memories(self):
         """清理过期和超量记忆"""
@@ -158,35 +244,26 @@ class MemoryManager:
         """
         if not query:
             # 如果没有查询条件，返回最新的记忆
-            sorted_memories = sorted(self.memories, key=lambda m: m.create_at, reverse=True)
-            return sorted_memories[:limit]
+            return heapq.nlargest(limit, self.memories, key=lambda m: m.create_at)
         
         # 使用简单的文本匹配进行搜索
-        query_lower = query.lower()
-        matched_memories = []
-        
-        for memory in self.memories:
-            if self._matches_query(memory.context, query_lower):
-                matched_memories.append(memory)
-        
-        # 按创建时间倒序排序
-        matched_memories.sort(key=lambda m: m.create_at, reverse=True)
+        query_pattern = _compile_query(query)
+        if query_pattern is None:
+            return []
+        matched_memories = (
+            memory for memory in self.memories
+            if self._matches_query(memory.context, query_pattern)
+        )
         
-        return matched_memories[:limit]
+        # 只取按创建时间最新的 limit 条，无需对全部结果排序
+        return heapq.nlargest(limit, matched_memories, key=lambda m: m.create_at)
     
 
         
-    def _matches_query(self, context: str, query_lower: str) -> bool:
+    def _matches_query(self, context: str, query_pattern: re.Pattern) -> bool:
         """检查记忆内容是否匹配查询"""
-        context_lower = context.lower()
-        
-        # 简单的关键词匹配
-        query_words = query_lower.split()
-        for word in query_words:
-            if word in context_lower:
-                return True
-        
-        return False
+        # 简单的关键词匹配，一次扫描即可检查所有关键词
+        return query_pattern.search(context) is not None
     
 
     
@@ -199,7 +276,7 @@ class MemoryManager:
         latest_memory = max(self.memories, key=lambda m: m.create_at)
         oldest_memory = min(self.memories, key=lambda m: m.create_at)
         
-        return f"共有 {total_memories} 条记忆，最新记忆创建于 {latest_memory.create_at.strftime('%Y-%m-%d %H:%M:%S')}，最旧记忆创建于 {oldest_memory.create_at.strftime('%Y-%m-%d %H:%M:%S')}"
+        return f"共有 {total_memories} 条记忆，最新记忆创建于 {latest_memory.create_at.strftime(TIMESTAMP_FORMAT)}，最旧记忆创建于 {oldest_memory.create_at.strftime(TIMESTAMP_FORMAT)}"
     
 
     
@@ -219,7 +296,7 @@ class MemoryManager:
         try:
             with open(file_path, 'w', encoding='utf-8') as f:
                 f.write(f"=== Agent: {self.agent_id} Memory Export ===\n")
-                f.write(f"Export Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+                f.write(f"Export Time: {datetime.now().strftime(TIMESTAMP_FORMAT)}\n")
                 f.write(f"Total Memories: {len(self.memories)}\n")
                 f.write("="*50 + "\n\n")
                 
@@ -355,4 +432,110 @@ class MemoryManager:
                 return thinking.strip()
         except Exception as e:
             logger.warning(f"记录失败思考失败: {e}")
-        return None 
\ No newline at end of file
+        return None
+
+# 每个数据库文件只打开一个长连接，所有 SQLiteMemoryManager 共享：(连接, 串行化访问的锁)
+_shared_connections: Dict[str, tuple] = {}
+_shared_connections_lock = threading.Lock()
+
+def _get_shared_connection(db_path: Path) -> tuple:
+    """获取数据库文件对应的共享连接，首次使用时创建并初始化表结构
+    
+    Args:
+        db_path: 数据库文件路径
+        
+    Returns:
+        (sqlite3.Connection, threading.Lock)
+    """
+    key = os.path.abspath(db_path)
+    with _shared_connections_lock:
+        shared = _shared_connections.get(key)
+        if shared is None:
+            conn = sqlite3.connect(key, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA temp_store=MEMORY")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS memories ("
+                "agent_id TEXT NOT NULL, created_at REAL NOT NULL, context TEXT NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_memories_agent_created ON memories (agent_id, created_at DESC)"
+            )
+            shared = (conn, threading.Lock())
+            _shared_connections[key] = shared
+        return shared
+
+class SQLiteMemoryManager(MemoryManager):
+    """基于 SQLite 的记忆管理器
+    
+    所有agent共享同一个数据库文件（WAL模式）和同一个长连接，每条记忆是一行记录：
+    存储新记忆只需插入一行，不再像纯文本格式那样每次重写整个文件。
+    """
+    
+    def __init__(self, agent_id: str, memory_dir: str = ".memory", db_name: str = "memories.db"):
+        """初始化记忆管理器
+        
+        Args:
+            agent_id: 代理ID
+            memory_dir: 记忆目录
+            db_name: 数据库文件名
+        """
+        self.db_path = Path(memory_dir) / db_name
+        Path(memory_dir).mkdir(exist_ok=True)
+        self.conn, self._db_lock = _get_shared_connection(self.db_path)
+        super().__init__(agent_id, memory_dir)
+    
+    def _load_memories(self):
+        """从数据库加载记忆"""
+        try:
+            with self._db_lock:
+                rows = self.conn.execute(
+                    "SELECT created_at, context FROM memories WHERE agent_id = ? ORDER BY created_at DESC LIMIT ?",
+                    (self.agent_id, self.max_memories)
+                ).fetchall()
+            for created_at, context in rows:
+                memory = Memory(create_at=datetime.fromtimestamp(created_at, timezone.utc), context=context)
+                if not self._is_memory_expired(memory):
+                    self.memories.append(memory)
+            logger.info(f"成功加载 {len(self.memories)} 条记忆")
+        except sqlite3.Error as e:
+            logger.error(f"加载记忆数据库失败: {e}")
+    
+    def _save_memories(self):
+        """数据库在存储时已逐条写入，无需整体保存"""
+    
+    def _persist_memories(self, memories: List[Memory]) -> None:
+        """在一个事务中用 executemany 插入新记忆，只提交一次，并同步删除数据库中被清理的旧记录
+        
+        Args:
+            memories: 新增的记忆
+        """
+        try:
+            with self._db_lock:
+                self.conn.execute("BEGIN")
+                try:
+                    self.conn.executemany(
+                        "INSERT INTO memories (agent_id, created_at, context) VALUES (?, ?, ?)",
+                        [(self.agent_id, memory.create_at.timestamp(), memory.context) for memory in memories]
+                    )
+                    self.conn.execute("COMMIT")
+                except sqlite3.Error:
+                    self.conn.execute("ROLLBACK")
+                    raise
+        except sqlite3.Error as e:
+            logger.error(f"保存记忆到数据库失败: {e}")
+        
+        # 清理过期和超量记忆，并同步删除数据库中更旧的记录
+        count_before = len(self.memories)
+        self._cleanup_memories()
+        if len(self.memories) < count_before:
+            oldest = min(m.create_at for m in self.memories)
+            try:
+                with self._db_lock:
+                    self.conn.execute(
+                        "DELETE FROM memories WHERE agent_id = ? AND created_at < ?",
+                        (self.agent_id, oldest.timestamp())
+                    )
+            except sqlite3.Error as e:
+                logger.error(f"清理数据库记忆失败: {e}")
@@ -9,19 +9,42 @@
 """
 
 import os
-import json
+import shutil
+import fnmatch
 import logging
 import asyncio
+import re
 import uuid
+import traceback
+import aiofiles
 from datetime import datetime, timezone
 from dataclasses import dataclass, asdict
 from enum import Enum
 from typing import Any, Optional
+from . import json_utils
 from .git_utils import GitManager
 from .llm_utils import LLMManager
 
 logger = logging.getLogger(__name__)
 
+# 从主仓库同步到agent仓库时要忽略的文件和目录模式
+SYNC_IGNORE_PATTERNS = (
+    '.git*',
+    '__pycache__',
+    '*.pyc',
+    '*.pyo',
+    '.DS_Store',
+    'Thumbs.db',
+    'agent_*',  # 忽略agent工作文件
+    '.memory',  # 忽略memory目录
+    '*.log',    # 忽略日志文件
+    '.issues.json',  # 忽略issues文件
+    '.pull_requests.json'  # 忽略PR文件
+)
+
+# 模式在导入时一次性合并编译，每个路径只做一次正则匹配
+SYNC_IGNORE_RE = re.compile('|'.join(f'(?:{fnmatch.translate(p)})' for p in SYNC_IGNORE_PATTERNS))
+
 class PRStatus(Enum):
     OPEN = "open"
     MERGED = "merged" 
@@ -93,10 +116,19 @@ class CollaborationManager:
     def _ensure_pr_file(self):
         """确保PR文件存在"""
         if not os.path.exists(self.pr_file_path):
-            with open(self.pr_file_path, "w", encoding="utf-8") as f:
-                json.dump({"pull_requests": []}, f, indent=2, ensure_ascii=False)
+            self._save_pr_data({"pull_requests": []})
             logger.info("创建Pull Request文件")
     
+    def _load_pr_data(self) -> dict[str, Any]:
+        """读取PR文件（以字节读取，直接交给 json_utils 解析）"""
+        with open(self.pr_file_path, "rb") as f:
+            return json_utils.loads(f.read())
+    
+    def _save_pr_data(self, data: dict[str, Any]) -> None:
+        """写入PR文件（序列化为 UTF-8 字节后一次写出）"""
+        with open(self.pr_file_path, "wb") as f:
+            f.write(json_utils.dumps(data, indent=True))
+    
     def register_agent_repo(self, agent_id: str, git_manager: GitManager):
         """注册agent仓库
         
@@ -139,12 +171,7 @@ class CollaborationManager:
                 logger.info(f"为{author}创建分支: {source_branch}")
                 
                 # 在分支中提交代码更改
-                for file_path, code_content in code_changes.items():
-                    full_path = os.path.join(agent_git.repo_path, file_path)
-                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
-                    
-                    with open(full_path, "w", encoding="utf-8") as f:
-                        f.write(code_content)
+                await self._write_code_files(agent_git.repo_path, code_changes)
                 
                 # 提交更改
                 commit_message = f"feat: {title}\n\nImplements #{pr.id}\n\nPR: #{pr.id}"
@@ -164,6 +191,24 @@ class CollaborationManager:
         
         return pr.id
     
+    async def _write_code_files(self, repo_path: str, code_changes: dict[str, str]):
+        """把代码更改并发写入仓库
+        
+        Args:
+            repo_path: 仓库路径
+            code_changes: 代码更改 {file_path: code_content}
+        """
+        async def _write(file_path: str, code_content: str):
+            full_path = os.path.join(repo_path, file_path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            async with aiofiles.open(full_path, "wb") as f:
+                await f.write(code_content.encode("utf-8"))
+        
+        await asyncio.gather(*(
+            _write(file_path, code_content)
+            for file_path, code_content in code_changes.items()
+        ))
+    
     async def _save_pull_request(self, pr: PullRequest):
         """保存PR到文件"""
         try:
@@ -171,8 +216,7 @@ class CollaborationManager:
             self._ensure_pr_file()
             
             # 读取现有PR
-            with open(self.pr_file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = self._load_pr_data()
             
             # 更新或添加PR
             prs = data.get("pull_requests", [])
@@ -190,8 +234,7 @@ class CollaborationManager:
             data["pull_requests"] = prs
             
             # 写回文件
-            with open(self.pr_file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            self._save_pr_data(data)
             
             # 提交PR文件更改到主仓库
             await self.main_repo_git_manager.commit_changes(
@@ -205,8 +248,7 @@ class CollaborationManager:
     async def get_open_pull_requests(self) -> list[PullRequest]:
         """获取开放的Pull Request"""
         try:
-            with open(self.pr_file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = self._load_pr_data()
             
             prs = []
             for pr_data in data.get("pull_requests", []):
@@ -235,8 +277,7 @@ class CollaborationManager:
             # 确保PR文件存在
             self._ensure_pr_file()
             # 读取PR
-            with open(self.pr_file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = self._load_pr_data()
             
             # 找到对应的PR
             prs = data.get("pull_requests", [])
@@ -268,8 +309,7 @@ class CollaborationManager:
             data["pull_requests"] = prs
             
             # 保存更改
-            with open(self.pr_file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            self._save_pr_data(data)
             
             # 提交更改
             await self.main_repo_git_manager.commit_changes(
@@ -303,8 +343,7 @@ class CollaborationManager:
         """
         try:
             # 读取PR
-            with open(self.pr_file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = self._load_pr_data()
             
             # 找到对应的PR
             pr_data = None
@@ -323,13 +362,8 @@ class CollaborationManager:
             # 将代码更改应用到主仓库
             logger.info(f"🔀 开始合并PR {pr_id} 到主仓库")
             
-            for file_path, code_content in pr_data["code_changes"].items():
-                full_path = os.path.join(self.main_repo_git_manager.repo_path, file_path)
-                os.makedirs(os.path.dirname(full_path), exist_ok=True)
-                
-                with open(full_path, "w", encoding="utf-8") as f:
-                    f.write(code_content)
-                
+            await self._write_code_files(self.main_repo_git_manager.repo_path, pr_data["code_changes"])
+            for file_path in pr_data["code_changes"]:
                 logger.info(f"📁 合并文件: {file_path}")
             
             # 提交合并
@@ -345,8 +379,7 @@ class CollaborationManager:
             data["pull_requests"][pr_index] = pr_data
             
             # 保存PR更改
-            with open(self.pr_file_path, "w", encoding="utf-8") as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            self._save_pr_data(data)
             
             await self.main_repo_git_manager.commit_changes(
                 f"Update PR {pr_id} status to merged",
@@ -369,64 +402,50 @@ class CollaborationManager:
         """同步所有agent的代码"""
         logger.info("�� 开始同步所有agent的代码...")
         
-        for agent_id, agent_git in self.agent_repos.items():
-            try:
-                logger.info(f"📥 同步agent {agent_id} 的代码")
-                
-                # 检查当前分支和工作目录状态
-                current_branch = await agent_git.get_current_branch()
-                logger.debug(f"🌿 agent {agent_id} 当前分支: {current_branch}")
-                
-                # 检查agent仓库状态，但不强制切换分支
-                branches = await agent_git.list_branches()
-                logger.debug(f"📋 agent {agent_id} 分支列表: {branches}")
-                
-                # 对于新的独立agent工作空间，不需要强制切换分支
-                if current_branch == "main":
-                    logger.debug(f"✅ agent {agent_id} 已在main分支")
-                else:
-                    logger.debug(f"📝 agent {agent_id} 在工作分支: {current_branch}")
-                    # 不强制切换，让agent继续在当前分支工作
-                
-                # 跳过同步，使用独立的agent工作空间
-                logger.debug(f"📭 agent {agent_id} 使用独立工作空间，跳过同步")
-                
-                logger.info(f"✅ agent {agent_id} 同步完成")
-                
-            except Exception as e:
-                logger.error(f"❌ 同步agent {agent_id} 失败: {e}")
-                import traceback
+        # 各agent仓库相互独立，并发同步
+        await asyncio.gather(*(
+            self._sync_agent(agent_id, agent_git)
+            for agent_id, agent_git in self.agent_repos.items()
+        ))
+    
+    async def _sync_agent(self, agent_id: str, agent_git: GitManager):
+        """同步单个agent的代码"""
+        try:
+            logger.info(f"📥 同步agent {agent_id} 的代码")
+            
+            # 检查当前分支和工作目录状态
+            current_branch = await agent_git.get_current_branch()
+            logger.debug(f"🌿 agent {agent_id} 当前分支: {current_branch}")
+            
+            # 检查agent仓库状态，但不强制切换分支
+            branches = await agent_git.list_branches()
+            logger.debug(f"📋 agent {agent_id} 分支列表: {branches}")
+            
+            # 对于新的独立agent工作空间，不需要强制切换分支
+            if current_branch == "main":
+                logger.debug(f"✅ agent {agent_id} 已在main分支")
+            else:
+                logger.debug(f"📝 agent {agent_id} 在工作分支: {current_branch}")
+                # 不强制切换，让agent继续在当前分支工作
+            
+            # 跳过同步，使用独立的agent工作空间
+            logger.debug(f"📭 agent {agent_id} 使用独立工作空间，跳过同步")
+            
+            logger.info(f"✅ agent {agent_id} 同步完成")
+            
+        except Exception as e:
+            logger.error(f"❌ 同步agent {agent_id} 失败: {e}")
+            if logger.isEnabledFor(logging.DEBUG):
                 logger.debug(f"🔍 同步错误详情:\n{traceback.format_exc()}")
     
     async def _sync_from_main_repo(self, agent_git: GitManager):
         """从主仓库同步代码到agent仓库"""
         try:
             # 获取主仓库中的所有非Git文件
-            import shutil
-            import fnmatch
-            
-            # 定义要忽略的文件和目录模式
-            ignore_patterns = [
-                '.git*',
-                '__pycache__',
-                '*.pyc',
-                '*.pyo',
-                '.DS_Store',
-                'Thumbs.db',
-                'agent_*',  # 忽略agent工作文件
-                '.memory',  # 忽略memory目录
-                '*.log',    # 忽略日志文件
-                '.issues.json',  # 忽略issues文件
-                '.pull_requests.json'  # 忽略PR文件
-            ]
             
             def should_ignore(path):
                 """检查是否应该忽略某个路径"""
-                basename = os.path.basename(path)
-                for pattern in ignore_patterns:
-                    if fnmatch.fnmatch(basename, pattern):
-                        return True
-                return False
+                return SYNC_IGNORE_RE.match(os.path.basename(path)) is not None
             
             # 同步文件
             synced_files = []
@@ -477,14 +496,13 @@ class CollaborationManager:
             
         except Exception as e:
             logger.error(f"从主仓库同步失败: {e}")
-            import traceback
-            logger.debug(f"🔍 同步错误详情:\n{traceback.format_exc()}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"🔍 同步错误详情:\n{traceback.format_exc()}")
     
     async def get_pr_by_id(self, pr_id: str) -> Optional[PullRequest]:
         """根据ID获取PR"""
         try:
-            with open(self.pr_file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = self._load_pr_data()
             
             for pr_data in data.get("pull_requests", []):
                 if pr_data["id"] == pr_id:
@@ -500,8 +518,7 @@ class CollaborationManager:
         logger.info("🧹 开始清理已合并的分支...")
         
         try:
-            with open(self.pr_file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            data = self._load_pr_data()
             
             for pr_data in data.get("pull_requests", []):
                 if pr_data["status"] == PRStatus.MERGED:
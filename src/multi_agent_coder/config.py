@@ -5,15 +5,16 @@
 
 import os
 import logging
-from typing import Any
+import functools
+from types import MappingProxyType
+from typing import Any, Mapping
 from dotenv import load_dotenv
 
-# 配置日志
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # 加载环境变量
-env_path = os.path.join(os.getcwd(), '.env')
+CWD = os.getcwd()
+env_path = os.path.join(CWD, '.env')
 logger.info(f"尝试加载环境变量文件: {env_path}")
 load_dotenv(env_path)
 
@@ -28,19 +29,36 @@ else:
 LLM_CONFIG = {
     "model": os.getenv("OPENAI_MODEL"),  # 直接使用环境变量，不设置默认值
     "temperature": float(os.getenv("OPENAI_TEMPERATURE", "0.7")),
+    "review_temperature": float(os.getenv("REVIEW_TEMPERATURE", os.getenv("OPENAI_TEMPERATURE", "0.7"))),  # 代码审查的温度，默认与temperature相同；设为0可使审查结果确定并被缓存复用
     "max_tokens": int(os.getenv("OPENAI_MAX_TOKENS", "1000")),
+    "max_concurrency": int(os.getenv("OPENAI_MAX_CONCURRENCY", "8")),  # 并发LLM调用上限（会根据限流自适应收缩）
+    "review_batch_size": int(os.getenv("REVIEW_BATCH_SIZE", "8")),  # 一次审查调用最多包含的文件数
+    "review_batch_max_chars": int(os.getenv("REVIEW_BATCH_MAX_CHARS", "24000")),  # 一次审查调用的代码字符数上限
+    "cache_enabled": os.getenv("LLM_CACHE", "1") != "0",  # 是否启用LLM响应磁盘缓存（仅对temperature为0的调用生效）
+    "cache_dir": os.getenv("LLM_CACHE_DIR", ".llm_cache"),  # LLM响应缓存目录
+    "cache_ttl": float(os.getenv("LLM_CACHE_TTL", "0")),  # LLM响应缓存有效期（秒），0 表示永不过期
+    "cache_memory_entries": int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256")),  # 进程内缓存的最近响应条数
+    "reuse_requirement_analysis": os.getenv("LLM_REUSE_ANALYSIS", "1") != "0",  # 相同需求（忽略空白差异）在模型、温度和prompt不变时复用已有的Issue拆分结果
+    "breaker_failure_threshold": int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),  # 连续失败多少次后熔断
+    "breaker_cooldown": float(os.getenv("LLM_BREAKER_COOLDOWN", "30")),  # 熔断冷却时间（秒）
 }
 
 # 系统配置
 SYSTEM_CONFIG = {
-    "repo_path": os.getenv("REPO_PATH", os.getcwd()),
+    "repo_path": os.getenv("REPO_PATH", CWD),
     "num_coders": int(os.getenv("NUM_CODERS", "3")),
     "check_interval": int(os.getenv("CHECK_INTERVAL", "60")),  # 秒
     "review_interval": int(os.getenv("REVIEW_INTERVAL", "30")),  # 秒
     "work_interval": int(os.getenv("WORK_INTERVAL", "10")),  # 秒
+    "max_in_flight_issues": int(os.getenv("MAX_IN_FLIGHT_ISSUES", "4")),  # 所有coder同时实现中的Issue上限
+    "memory_backend": os.getenv("MEMORY_BACKEND", "text"),  # 记忆存储后端：text（纯文本文件）或 sqlite（共享数据库）
     # 新增多仓库配置
     "playground_repo": os.getenv("PLAYGROUND_REPO", ""),  # 默认为空，使用本地仓库
     "agent_repos_dir": os.getenv("AGENT_REPOS_DIR", "./agent_repos"),
+    "max_parallel_repo_setups": int(os.getenv("MAX_PARALLEL_REPO_SETUPS", "8")),  # 同时设置的agent仓库数量上限
+    "seed_max_files": int(os.getenv("SEED_MAX_FILES", "5000")),  # 复制到playground的参考项目文件数上限，0表示不限制
+    "seed_max_bytes": int(os.getenv("SEED_MAX_BYTES", str(200 * 1024 * 1024))),  # 参考项目总大小上限（字节），0表示不限制
+    "clone_depth": int(os.getenv("MAC_CLONE_DEPTH", "1")),  # 克隆用户仓库的历史深度，0表示完整克隆
     "use_separate_repos": os.getenv("USE_SEPARATE_REPOS", "true").lower() == "true",
 }
 
@@ -66,14 +84,17 @@ AGENT_CONFIG = {
     },
 }
 
-def get_config() -> dict[str, Any]:
-    """获取完整配置
+@functools.lru_cache(maxsize=1)
+def get_config() -> Mapping[str, Mapping[str, Any]]:
+    """获取完整配置（结果会被缓存，多次调用返回同一个只读视图）
+    
+    返回的映射及各子配置都是只读的，需要覆盖的值应作为参数单独传递。
     
     Returns:
-        配置字典
+        配置映射
     """
-    return {
-        "llm": LLM_CONFIG,
-        "system": SYSTEM_CONFIG,
-        "agent": AGENT_CONFIG,
-    } 
\ No newline at end of file
+    return MappingProxyType({
+        "llm": MappingProxyType(LLM_CONFIG),
+        "system": MappingProxyType(SYSTEM_CONFIG),
+        "agent": MappingProxyType(AGENT_CONFIG),
+    })
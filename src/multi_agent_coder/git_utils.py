@@ -17,9 +17,76 @@ import random
 from pathlib import Path
 from typing import Optional, Any
 from datetime import datetime
+from . import json_utils
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，回退到独占创建锁文件
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
+# 一次 git add 传入的最大路径数
+GIT_ADD_BATCH_SIZE = 1000
+
+# 空Issues文件的内容
+EMPTY_ISSUES_JSON = b'{\n  "issues": []\n}'
+
+def create_empty_issues_file(issues_file: str) -> bool:
+    """原子地创建空的Issues文件
+    
+    先写入临时文件并落盘，再硬链接到目标路径：进程中途被杀也不会留下半截的JSON，
+    目标已存在时链接失败，不会覆盖已有内容。文件系统不支持硬链接时（部分 FUSE、SMB、
+    overlay 挂载）改为独占创建目标文件后直接写入。
+    
+    Args:
+        issues_file: Issues文件路径
+        
+    Returns:
+        是否新建了文件（文件已存在时返回 False）
+    """
+    fd, temp_file = tempfile.mkstemp(
+        prefix=f"{os.path.basename(issues_file)}.", suffix='.tmp',
+        dir=os.path.dirname(issues_file) or '.'
+    )
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(EMPTY_ISSUES_JSON)
+            f.flush()
+            os.fsync(f.fileno())
+        os.link(temp_file, issues_file)
+        return True
+    except FileExistsError:
+        return False
+    except OSError as e:
+        logger.debug(f"硬链接创建Issues文件失败，改为独占创建: {e}")
+        return _create_file_exclusive(issues_file, EMPTY_ISSUES_JSON)
+    finally:
+        try:
+            os.unlink(temp_file)
+        except FileNotFoundError:
+            pass
+
+def _create_file_exclusive(path: str, content: bytes) -> bool:
+    """以 O_EXCL 独占创建文件并写入内容
+    
+    Args:
+        path: 文件路径
+        content: 文件内容
+        
+    Returns:
+        是否新建了文件（文件已存在时返回 False）
+    """
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    return True
+
 class GitManager:
     """Git 仓库管理器"""
     
@@ -32,6 +99,14 @@ class GitManager:
         self.repo_path = os.path.abspath(repo_path)
         self.issues_file = os.path.join(self.repo_path, '.issues.json')  # 修复：使用.issues.json保持一致性
         self.lock_file = os.path.join(self.repo_path, '.git_operations.lock')
+        # 持有 flock 时的文件描述符
+        self._lock_fd: Optional[int] = None
+        # Issues解析结果和open状态Issues的缓存：(文件的 (inode, 大小, 修改时间), 数据)
+        # 缓存的数据从不原地修改，更新时整体替换元组，不加锁的读取方总能看到一致的键和数据
+        self._issues_cache: tuple[Optional[tuple[int, int, int]], dict[str, list[dict[str, Any]]]] = (None, {"issues": []})
+        self._open_issues_cache: tuple[Optional[tuple[int, int, int]], list[dict[str, Any]]] = (None, [])
+        # Issues变化通知：每次通过本实例修改Issues后置位并换成新的Event，等待者立即被唤醒
+        self._issues_changed = asyncio.Event()
         
         # 确保repo路径存在且是git仓库
         if not os.path.exists(self.repo_path):
@@ -89,11 +164,18 @@ class GitManager:
     async def _acquire_lock(self, timeout: float = 30.0):
         """获取文件锁，防止并发操作
         
+        支持 fcntl 的系统上使用 flock：锁由内核持有，进程退出（包括崩溃）时自动释放，
+        不会留下需要超时后强制清理的锁文件。其他系统回退到独占创建锁文件。
+        
         Args:
             timeout: 超时时间（秒）
         """
-        start_time = time.time()
-        while time.time() - start_time < timeout:
+        if fcntl is not None:
+            return await self._acquire_flock(timeout)
+        
+        # 使用单调时钟计算超时，不受系统时间调整影响
+        start_time = time.monotonic()
+        while time.monotonic() - start_time < timeout:
             try:
                 # 创建锁文件
                 lock_fd = os.open(self.lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
@@ -114,17 +196,73 @@ class GitManager:
         
         raise TimeoutError("获取Git操作锁超时")
     
+    async def _acquire_flock(self, timeout: float) -> bool:
+        """用 flock 获取排他锁（非阻塞尝试，失败时让出事件循环后重试）
+        
+        Args:
+            timeout: 超时时间（秒）
+        """
+        # 锁文件放在 .git 目录中，不会出现在工作区里被当作改动提交
+        git_dir = os.path.join(self.repo_path, '.git')
+        lock_path = os.path.join(git_dir, 'multi_agent_coder.lock') if os.path.isdir(git_dir) else self.lock_file
+        lock_fd = os.open(lock_path, os.O_CREAT | os.O_RDWR)
+        start_time = time.monotonic()
+        try:
+            while True:
+                try:
+                    fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    self._lock_fd = lock_fd
+                    return True
+                except BlockingIOError:
+                    if time.monotonic() - start_time >= timeout:
+                        raise TimeoutError("获取Git操作锁超时")
+                    await asyncio.sleep(0.05 + random.uniform(0, 0.05))
+        except BaseException:
+            # 超时、出错或等待期间被取消时关闭描述符，避免泄漏
+            os.close(lock_fd)
+            raise
+    
     def _release_lock(self):
         """释放文件锁"""
+        if self._lock_fd is not None:
+            # 关闭文件描述符即释放 flock
+            lock_fd, self._lock_fd = self._lock_fd, None
+            os.close(lock_fd)
+            return
+        if fcntl is not None:
+            return
         try:
             if os.path.exists(self.lock_file):
                 os.remove(self.lock_file)
         except OSError:
             pass
     
+    async def _release_lock_after(self, worker: asyncio.Future):
+        """等工作线程结束后再释放文件锁
+        
+        任务被取消时工作线程仍在执行git/文件操作，此时释放锁会让其他代理同时改动同一仓库。
+        
+        Args:
+            worker: 工作线程对应的 Future
+        """
+        def release(done: asyncio.Future):
+            if not done.cancelled():
+                done.exception()  # 调用方已被取消，这里取走异常，避免"未读取的异常"警告
+            self._release_lock()
+        
+        try:
+            await asyncio.wait({worker})
+        except asyncio.CancelledError:
+            # 等待期间再次被取消：不再等待，改由线程结束时释放
+            worker.add_done_callback(release)
+            raise
+        release(worker)
+    
     async def _retry_with_backoff(self, func, max_retries=5, base_delay=0.1):
         """带指数退避的重试机制
         
+        同步函数（git子进程、Issues文件读写）在工作线程中执行，不阻塞事件循环。
+        
         Args:
             func: 要重试的函数
             max_retries: 最大重试次数
@@ -136,10 +274,18 @@ class GitManager:
             try:
                 # 获取锁
                 await self._acquire_lock()
+                worker = None
                 try:
-                    return await func() if asyncio.iscoroutinefunction(func) else func()
+                    if asyncio.iscoroutinefunction(func):
+                        return await func()
+                    # shield：任务被取消时只中断等待，工作线程中的操作照常执行完
+                    worker = asyncio.ensure_future(asyncio.to_thread(func))
+                    return await asyncio.shield(worker)
                 finally:
-                    self._release_lock()
+                    if worker is not None and not worker.done():
+                        await self._release_lock_after(worker)
+                    else:
+                        self._release_lock()
             except (subprocess.CalledProcessError, OSError, IOError, TimeoutError) as e:
                 last_exception = e
                 if "index.lock" in str(e) or "could not be obtained" in str(e) or "timeout" in str(e).lower():
@@ -157,42 +303,72 @@ class GitManager:
                         except OSError:
                             pass
                 else:
-                    # 其他错误，直接抛出
-                    self._release_lock()
+                    # 其他错误，直接抛出（锁已在 finally 中释放；获取锁失败时本就未持有锁，不能释放别人的锁）
                     raise
         
         # 所有重试都失败了
-        self._release_lock()
         logger.error(f"Git操作失败，已重试 {max_retries} 次: {last_exception}")
         raise last_exception
     
+    def _issues_file_key(self) -> Optional[tuple[int, int, int]]:
+        """Issues文件的 (inode, 大小, 修改时间)，文件不存在时返回 None
+        
+        Issues文件总是通过临时文件+重命名整体替换，任何修改都会改变其中至少一项。
+        """
+        try:
+            st = os.stat(self.issues_file)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+    
+    def _read_issues(self) -> dict[str, list[dict[str, Any]]]:
+        """读取Issues数据，文件未变化时直接返回上次解析（或保存）的结果
+        
+        返回的对象与缓存共享，调用方不得修改；需要修改时使用 _load_issues。
+        """
+        key = self._issues_file_key()
+        if key is None:
+            return {"issues": []}
+        cached_key, cached_data = self._issues_cache
+        if key == cached_key:
+            return cached_data
+        try:
+            # 以字节读取后直接交给 json_utils 解析，省去解码和 strip 产生的中间字符串
+            with open(self.issues_file, 'rb') as f:
+                content = f.read()
+            data = json_utils.loads(content) if content.strip() else {"issues": []}
+        except FileNotFoundError:
+            return {"issues": []}
+        except (json.JSONDecodeError, IOError) as e:
+            logger.warning(f"加载Issues文件失败: {e}")
+            return {"issues": []}
+        self._issues_cache = (key, data)
+        return data
+    
     def _load_issues(self) -> dict[str, list[dict[str, Any]]]:
-        """从文件加载issues"""
-        if os.path.exists(self.issues_file):
-            try:
-                with open(self.issues_file, 'r', encoding='utf-8') as f:
-                    content = f.read().strip()
-                    if not content:
-                        return {"issues": []}
-                    return json.loads(content)
-            except (json.JSONDecodeError, IOError) as e:
-                logger.warning(f"加载Issues文件失败: {e}")
-                return {"issues": []}
-        return {"issues": []}
+        """加载issues用于读-改-写：返回缓存数据的副本，修改它不会影响其他线程正在读取的缓存"""
+        data = self._read_issues()
+        return {**data, "issues": [dict(issue) for issue in data.get("issues", [])]}
     
     def _save_issues(self, data: dict[str, list[dict[str, Any]]]) -> None:
-        """保存issues到文件"""
+        """保存issues到文件，保存后的数据直接作为解析缓存，下次加载无需重新解析
+        
+        保存后 data 归缓存所有，调用方不应再修改它。
+        """
+        # 写入完成前先让缓存失效，写入失败时不会留下与文件不一致的缓存
+        self._issues_cache = (None, {"issues": []})
         try:
             # 使用临时文件确保原子性写入
             temp_file = self.issues_file + '.tmp'
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            with open(temp_file, 'wb') as f:
+                f.write(json_utils.dumps(data, indent=True))
             
             # 原子性重命名
             os.replace(temp_file, self.issues_file)
         except IOError as e:
             logger.error(f"保存Issues文件失败: {e}")
             raise
+        self._issues_cache = (self._issues_file_key(), data)
     
     async def create_issue(self, title: str, description: str) -> dict[str, Any]:
         """创建新的 Issue
@@ -204,30 +380,55 @@ class GitManager:
         Returns:
             Issue 信息字典
         """
+        issues = await self.create_issues([(title, description)])
+        return issues[0]
+    
+    async def create_issues(self, items: list[tuple[str, str]]) -> list[dict[str, Any]]:
+        """批量创建 Issue：只读写一次Issues文件，只提交一次
+        
+        Args:
+            items: (标题, 描述) 列表
+            
+        Returns:
+            Issue 信息字典列表，顺序与 items 一致
+        """
+        if not items:
+            return []
+        
         def _create():
             data = self._load_issues()
-            issue = {
-                "id": str(uuid.uuid4()),
-                "title": title,
-                "description": description,
-                "status": "open",
-                "assigned_to": None,
-                "code_submission": None,
-                "created_at": str(datetime.now())
-            }
-            data["issues"].append(issue)
+            created_at = str(datetime.now())
+            issues = [
+                {
+                    "id": str(uuid.uuid4()),
+                    "title": title,
+                    "description": description,
+                    "status": "open",
+                    "assigned_to": None,
+                    "code_submission": None,
+                    "created_at": created_at
+                }
+                for title, description in items
+            ]
+            data["issues"].extend(issues)
             self._save_issues(data)
-            return issue
+            return [dict(issue) for issue in issues]
         
         # 创建Issue
-        issue = await self._retry_with_backoff(_create)
+        issues = await self._retry_with_backoff(_create)
+        self._notify_issues_changed()
+        
+        if len(issues) == 1:
+            commit_message = f'创建 Issue: {issues[0]["title"]}'
+        else:
+            commit_message = f'创建 {len(issues)} 个 Issue'
         
         # 提交更改
         def _commit_create():
             # 添加文件到Git
             self._run_git_command(['add', '.issues.json'])
             # 提交
-            self._run_git_command(['commit', '-m', f'创建 Issue: {title}'])
+            self._run_git_command(['commit', '-m', commit_message])
         
         try:
             await self._retry_with_backoff(_commit_create)
@@ -235,16 +436,55 @@ class GitManager:
             if "nothing to commit" not in str(e):
                 logger.warning(f"提交Issue创建失败: {e}")
         
-        logger.info(f"创建 Issue: {title}")
-        return issue
+        for issue in issues:
+            logger.info(f"创建 Issue: {issue['title']}")
+        return issues
+    
+    def get_open_issues_cached(self) -> list[dict[str, Any]]:
+        """获取所有open状态的issues，文件未变化时直接返回缓存
+        
+        多个代理轮询时只有文件变化后的第一次调用需要重新筛选，其余调用只需一次 stat，无需加锁也无需读文件。
+        
+        Returns:
+            open状态Issues的浅拷贝列表
+        """
+        key = self._issues_file_key()
+        if key is None:
+            return []
+        cached_key, open_issues = self._open_issues_cache
+        if key != cached_key:
+            # 缓存的Issues数据不会被原地修改，这里无需加锁
+            data = self._read_issues()
+            open_issues = [issue for issue in data.get("issues", []) if issue.get("status") == "open"]
+            self._open_issues_cache = (key, open_issues)
+        return [dict(issue) for issue in open_issues]
     
     async def get_open_issues(self) -> list[dict[str, Any]]:
         """获取所有open状态的issues"""
-        def _get():
-            data = self._load_issues()
-            return [issue for issue in data.get("issues", []) if issue.get("status") == "open"]
+        return await asyncio.to_thread(self.get_open_issues_cached)
+    
+    def _notify_issues_changed(self) -> None:
+        """唤醒所有等待Issues变化的协程"""
+        self._issues_changed.set()
+        self._issues_changed = asyncio.Event()
+    
+    async def wait_for_issues_change(self, timeout: float) -> bool:
+        """等待Issues被修改
+        
+        同一进程内的代理共享playground的GitManager，通过它创建、认领、更新Issue时会立即唤醒等待者；
+        其他进程或外部工具修改Issues文件无法感知，由超时兜底。
         
-        return await self._retry_with_backoff(_get)
+        Args:
+            timeout: 最长等待时间（秒）
+            
+        Returns:
+            是否因Issues变化而被唤醒（超时返回 False）
+        """
+        try:
+            await asyncio.wait_for(self._issues_changed.wait(), timeout)
+            return True
+        except TimeoutError:
+            return False
     
     async def assign_issue(self, issue_id: str, assignee: str) -> bool:
         """分配 Issue 给指定代理
@@ -270,6 +510,7 @@ class GitManager:
         try:
             success = await self._retry_with_backoff(_assign)
             if success:
+                self._notify_issues_changed()
                 # 提交更改
                 def _commit_assign():
                     self._run_git_command(['add', '.issues.json'])
@@ -287,7 +528,52 @@ class GitManager:
             logger.error(f"分配Issue失败: {e}")
         
         return False
-    
+
+    async def claim_next_open_issue(self, assignee: str) -> Optional[dict[str, Any]]:
+        """原子地认领下一个open状态的Issue
+
+        查找与分配在同一次加锁的读-改-写中完成，多个代理不会认领到同一个Issue，
+        也无需先读取open列表再逐个尝试分配。
+
+        Args:
+            assignee: 认领Issue的代理
+
+        Returns:
+            被认领的Issue；没有可认领的Issue时返回None
+        """
+        def _claim():
+            data = self._load_issues()
+            for issue in data["issues"]:
+                if issue.get("status") == "open":
+                    issue["assigned_to"] = assignee
+                    issue["status"] = "assigned"
+                    self._save_issues(data)
+                    return dict(issue)
+            return None
+
+        try:
+            issue = await self._retry_with_backoff(_claim)
+        except Exception as e:
+            logger.error(f"认领Issue失败: {e}")
+            return None
+
+        if issue is None:
+            return None
+        self._notify_issues_changed()
+
+        def _commit_claim():
+            self._run_git_command(['add', '.issues.json'])
+            self._run_git_command(['commit', '-m', f'分配 Issue {issue["id"]} 给 {assignee}'])
+
+        try:
+            await self._retry_with_backoff(_commit_claim)
+        except subprocess.CalledProcessError as e:
+            if "nothing to commit" not in str(e):
+                logger.warning(f"提交Issue分配失败: {e}")
+
+        logger.info(f"分配 Issue {issue['id']} 给 {assignee}")
+        return issue
+
     async def update_issue_status(self, issue_id: str, status: str, code_submission: Optional[str] = None) -> bool:
         """更新 Issue 状态
         
@@ -313,6 +599,7 @@ class GitManager:
         try:
             success = await self._retry_with_backoff(_update)
             if success:
+                self._notify_issues_changed()
                 # 提交更改
                 def _commit_update():
                     # 检查是否有更改需要提交
@@ -342,6 +629,36 @@ class GitManager:
         
         return False
     
+    async def filter_ignored(self, files: list[str]) -> list[str]:
+        """去掉会被 .gitignore 忽略的文件，避免显式 git add 时报错
+        
+        Args:
+            files: 相对于仓库根目录的文件列表
+            
+        Returns:
+            未被忽略的文件列表
+        """
+        def _filter():
+            # 一次 check-ignore 调用检查全部路径，路径以NUL分隔
+            result = subprocess.run(
+                ['git', 'check-ignore', '--stdin', '-z'],
+                cwd=self.repo_path,
+                input='\0'.join(files),
+                capture_output=True,
+                text=True
+            )
+            # 退出码1表示没有路径被忽略，其他非0退出码表示检查失败，此时原样返回
+            if result.returncode != 0:
+                if result.returncode != 1:
+                    logger.warning(f"检查忽略文件失败: {result.stderr.strip()}")
+                return files
+            ignored = set(result.stdout.split('\0'))
+            return [file for file in files if file not in ignored]
+        
+        if not files:
+            return []
+        return await asyncio.to_thread(_filter)
+    
     async def commit_changes(self, message: str, files: list[str]) -> str:
         """提交代码更改
         
@@ -353,10 +670,11 @@ class GitManager:
             提交的hash值，失败时返回空字符串
         """
         def _commit():
-            # 添加文件
-            for file in files:
-                if os.path.exists(os.path.join(self.repo_path, file)):
-                    self._run_git_command(['add', file])
+            # 添加文件（每次git调用添加一批存在的文件，而不是每个文件启动一个进程；
+            # 分批是为了让命令行长度不超过ARG_MAX）
+            existing_files = [file for file in files if os.path.exists(os.path.join(self.repo_path, file))]
+            for start in range(0, len(existing_files), GIT_ADD_BATCH_SIZE):
+                self._run_git_command(['add', '--'] + existing_files[start:start + GIT_ADD_BATCH_SIZE])
             
             # 检查是否有改动
             try:
@@ -612,12 +930,37 @@ class GitManager:
             logger.error(f"删除分支失败: {e}")
             return False
     
+    def _read_head_branch(self) -> Optional[str]:
+        """直接读取 .git/HEAD 获取当前分支，无需启动 git 进程
+        
+        Returns:
+            当前分支名称；分离HEAD时返回空字符串；无法读取时返回 None
+        """
+        head_path = os.path.join(self.repo_path, '.git', 'HEAD')
+        try:
+            with open(head_path, 'r', encoding='utf-8') as f:
+                head = f.read().strip()
+        except OSError:
+            # .git 可能是文件（worktree/submodule），交给 git 命令处理
+            return None
+        
+        if head.startswith('ref: refs/heads/'):
+            return head[len('ref: refs/heads/'):]
+        if head.startswith('ref: '):
+            return None
+        # 分离HEAD，与 git branch --show-current 行为一致
+        return ""
+    
     async def get_current_branch(self) -> str:
         """获取当前分支名称
         
         Returns:
             当前分支名称
         """
+        branch = self._read_head_branch()
+        if branch is not None:
+            return branch
+        
         def _get_branch():
             try:
                 return self._run_git_command(['branch', '--show-current'], check_output=True)
@@ -0,0 +1,40 @@
+"""JSON 工具模块
+
+优先使用 orjson（C 扩展，解析和序列化都更快），未安装时回退到标准库 json。
+输出统一为 UTF-8 编码的 bytes，中文不做 ASCII 转义。
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # orjson 是可选依赖
+    orjson = None
+
+def loads(data: Union[bytes, str]) -> Any:
+    """解析 JSON
+    
+    Args:
+        data: JSON 文本或 UTF-8 字节
+        
+    Returns:
+        解析结果
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    """序列化为 UTF-8 编码的 JSON 字节
+    
+    Args:
+        obj: 要序列化的对象
+        indent: 是否使用两个空格缩进
+        
+    Returns:
+        JSON 字节
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode('utf-8')
@@ -8,37 +8,264 @@ import json
 import logging
 import asyncio
 import re
+import hashlib
+from collections import OrderedDict
+from pathlib import Path
 from typing import Any, Optional, Dict, List, Union
-from openai import AsyncOpenAI
+import time
+from openai import AsyncOpenAI, RateLimitError, InternalServerError, APIConnectionError
 import httpx
 from .config import LLM_CONFIG
 
+try:
+    import h2  # noqa: F401  httpx 的 HTTP/2 支持依赖 h2
+    HTTP2_AVAILABLE = True
+except ImportError:  # h2 是可选依赖
+    HTTP2_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# 批量审查响应中，模型回显文件路径时可能附带的修饰字符
+REVIEW_PATH_DECORATIONS = " \t[]`*\"'"
+
+class AdaptiveConcurrencyLimiter:
+    """自适应并发限制器（AIMD）
+    
+    根据响应头中的剩余配额和 429 错误动态调整允许的并发LLM调用数：
+    连续成功时加性增加，遇到限流或配额即将耗尽时乘性减少。
+    """
+    
+    def __init__(self, max_limit: int = 8, min_limit: int = 1, increase_every: int = 5):
+        """初始化限制器
+        
+        Args:
+            max_limit: 并发上限
+            min_limit: 并发下限
+            increase_every: 连续成功多少次后并发数加1
+        """
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+        self.increase_every = increase_every
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self._success_streak = 0
+        self._condition = asyncio.Condition()
+    
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self.in_flight -= 1
+            # 并发数可能刚被上调，唤醒所有等待者重新检查
+            self._condition.notify_all()
+    
+    def on_success(self, remaining_requests: Optional[int] = None) -> None:
+        """记录一次成功调用，需在持有名额时调用"""
+        if remaining_requests is not None and remaining_requests <= self.in_flight:
+            # 配额即将耗尽，提前收缩而不是等到 429
+            self._decrease()
+            return
+        
+        self._success_streak += 1
+        if self._success_streak >= self.increase_every and self.limit < self.max_limit:
+            self.limit += 1
+            self._success_streak = 0
+            logger.debug(f"LLM并发上限增加到 {self.limit}")
+    
+    def on_rate_limited(self) -> None:
+        """记录一次限流"""
+        self._decrease()
+    
+    def _decrease(self) -> None:
+        self._success_streak = 0
+        new_limit = max(self.min_limit, self.limit // 2)
+        if new_limit != self.limit:
+            logger.warning(f"LLM并发上限从 {self.limit} 降低到 {new_limit}")
+            self.limit = new_limit
+
+class CircuitOpenError(RuntimeError):
+    """熔断器处于打开状态时拒绝LLM调用"""
+
+class CircuitBreaker:
+    """LLM调用熔断器
+    
+    连续出现限流/服务端错误达到阈值后打开，冷却期内直接拒绝调用；
+    冷却结束后进入半开状态，只放行一个探测调用，其余调用在探测结果记录前继续被拒绝，
+    探测成功则关闭，失败则重新打开。
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        """初始化熔断器
+        
+        Args:
+            failure_threshold: 连续失败多少次后打开
+            cooldown: 打开后的冷却时间（秒）
+        """
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+    
+    def before_call(self) -> bool:
+        """调用前检查，熔断打开或半开探测进行中时抛出 CircuitOpenError
+        
+        Returns:
+            本次调用是否为半开状态下的探测调用
+        """
+        if self.state == self.OPEN:
+            remaining = self.cooldown - (time.monotonic() - self._opened_at)
+            if remaining > 0:
+                raise CircuitOpenError(f"LLM熔断器已打开，{remaining:.0f} 秒后重试")
+            self.state = self.HALF_OPEN
+            logger.info("LLM熔断器进入半开状态，尝试恢复调用")
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                raise CircuitOpenError("LLM熔断器半开，等待探测调用结果")
+            self._probe_in_flight = True
+            return True
+        return False
+    
+    def release_probe(self) -> None:
+        """探测调用既未成功也未记为失败（如请求参数错误、任务被取消）时释放探测名额"""
+        self._probe_in_flight = False
+    
+    def record_success(self) -> None:
+        """记录一次成功调用"""
+        if self.state != self.CLOSED:
+            logger.info("LLM熔断器关闭，调用已恢复")
+        self.state = self.CLOSED
+        self._consecutive_failures = 0
+        self._probe_in_flight = False
+    
+    def record_failure(self) -> None:
+        """记录一次限流或服务端错误"""
+        self._probe_in_flight = False
+        self._consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"LLM连续失败 {self._consecutive_failures} 次，熔断器打开 {self.cooldown} 秒")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+
+class LLMResponseCache:
+    """LLM 响应缓存
+    
+    以 SHA-256(模型 + 消息 + 温度 + max_tokens) 为键，把响应文本保存在缓存目录下，
+    相同的请求在多次运行之间直接命中缓存，不再产生网络调用和token消耗。
+    最近使用的条目同时保存在进程内的LRU字典中，重复命中时无需读磁盘。
+    """
+    
+    def __init__(self, cache_dir: str, ttl: float = 0, memory_entries: int = 256):
+        """初始化缓存
+        
+        Args:
+            cache_dir: 缓存目录
+            ttl: 有效期（秒），0 表示永不过期
+            memory_entries: 进程内缓存的最大条数
+        """
+        self.cache_dir = Path(cache_dir)
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        # 键 -> (写入时间, 内容)，按最近使用排序
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+    
+    @staticmethod
+    def make_key(model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int) -> str:
+        """计算请求的缓存键"""
+        payload = json.dumps(
+            {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _path_for(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.txt"
+    
+    def _is_expired(self, stored_at: float) -> bool:
+        return self.ttl > 0 and time.time() - stored_at > self.ttl
+    
+    def _remember(self, key: str, stored_at: float, content: str) -> None:
+        """放入进程内缓存，超过容量时淘汰最久未使用的条目"""
+        if self.memory_entries <= 0:
+            return
+        self._memory[key] = (stored_at, content)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+    
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中或已过期时返回 None"""
+        entry = self._memory.get(key)
+        if entry is not None:
+            if not self._is_expired(entry[0]):
+                self._memory.move_to_end(key)
+                return entry[1]
+            del self._memory[key]
+        
+        path = self._path_for(key)
+        try:
+            stored_at = path.stat().st_mtime
+            if self._is_expired(stored_at):
+                return None
+            content = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"读取LLM缓存失败: {e}")
+            return None
+        self._remember(key, stored_at, content)
+        return content
+    
+    def set(self, key: str, content: str) -> None:
+        """写入缓存（先写临时文件再替换，避免并发读到半截内容）"""
+        self._remember(key, time.time(), content)
+        path = self._path_for(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(content, encoding="utf-8")
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"写入LLM缓存失败: {e}")
+
 class LLMManager:
     """LLM 管理器 - 支持灵活的prompt驱动任务执行"""
     
-    def __init__(self, api_key: str, proxy_url: str = None, max_retries: int = 3):
+    def __init__(self, api_key: str, proxy_url: str = None, max_retries: int = 3,
+                 http_client: Optional[httpx.AsyncClient] = None,
+                 limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+                 circuit_breaker: Optional[CircuitBreaker] = None):
         """初始化 LLM 管理器
         
         Args:
             api_key: OpenAI API 密钥
             proxy_url: 代理URL，格式如 http://127.0.0.1:7890
             max_retries: 最大重试次数
+            http_client: 共享的HTTP客户端，多个管理器传入同一个实例即可复用连接池
+            limiter: 自适应并发限制器，可选
+            circuit_breaker: 熔断器，多个管理器可共享同一个实例，可选
         """
-        # 配置HTTP客户端，支持代理和重试
-        if proxy_url:
-            http_client = httpx.AsyncClient(
-                proxy=proxy_url,
-                timeout=60.0
-            )
-            logger.info(f"使用代理: {proxy_url}")
-        else:
-            # 即使没有代理也要创建HTTP客户端，确保连接稳定性
-            http_client = httpx.AsyncClient(
-                timeout=60.0
-            )
-            logger.info("使用直接连接（无代理）")
+        if http_client is None:
+            http_client = self.create_http_client(proxy_url)
+        if limiter is None:
+            limiter = AdaptiveConcurrencyLimiter(LLM_CONFIG["max_concurrency"])
+        self.limiter = limiter
+        if circuit_breaker is None:
+            circuit_breaker = CircuitBreaker(LLM_CONFIG["breaker_failure_threshold"], LLM_CONFIG["breaker_cooldown"])
+        self.circuit_breaker = circuit_breaker
+        self.cache = LLMResponseCache(
+            LLM_CONFIG["cache_dir"], LLM_CONFIG["cache_ttl"], LLM_CONFIG["cache_memory_entries"]
+        ) if LLM_CONFIG["cache_enabled"] else None
         
         self.client = AsyncOpenAI(
             api_key=api_key,
@@ -48,6 +275,36 @@ class LLMManager:
         self.max_retries = max_retries
         logger.info("初始化 LLM 管理器")
     
+    @staticmethod
+    def create_http_client(proxy_url: str = None, max_connections: int = 256,
+                           max_keepalive_connections: int = 64) -> httpx.AsyncClient:
+        """创建带连接池的HTTP客户端，支持代理，可用时启用HTTP/2
+        
+        Args:
+            proxy_url: 代理URL
+            max_connections: 最大连接数
+            max_keepalive_connections: 最大保活连接数
+            
+        Returns:
+            httpx.AsyncClient 实例
+        """
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections
+        )
+        if proxy_url:
+            logger.info(f"使用代理: {proxy_url}")
+        else:
+            logger.info("使用直接连接（无代理）")
+        # 即使没有代理也要创建HTTP客户端，确保连接稳定性
+        # 安装了 h2 时启用 HTTP/2，所有代理的并发请求可以复用同一条连接
+        return httpx.AsyncClient(
+            proxy=proxy_url,
+            timeout=60.0,
+            limits=limits,
+            http2=HTTP2_AVAILABLE
+        )
+    
     async def execute_task(self, task_type: str, context: Dict[str, Any], 
                           custom_prompt: str = None, **kwargs) -> Any:
         """执行通用任务
@@ -69,7 +326,7 @@ class LLMManager:
                 prompt = self._get_task_prompt(task_type, context, **kwargs)
             
             # 执行LLM调用
-            response = await self._call_llm(prompt, context.get('temperature', 0.7))
+            response = await self._call_llm(prompt, context.get('temperature'))
             
             # 根据任务类型处理响应
             return self._process_response(task_type, response, context)
@@ -78,8 +335,15 @@ class LLMManager:
             logger.error(f"执行任务 {task_type} 失败: {e}")
             return self._get_fallback_result(task_type, context)
     
-    async def _call_llm(self, prompt: str, temperature: float = 0.7) -> str:
-        """调用LLM API"""
+    async def _call_llm(self, prompt: str, temperature: Optional[float] = None) -> str:
+        """调用LLM API
+        
+        Args:
+            prompt: 提示词
+            temperature: 温度参数，默认使用 LLM_CONFIG["temperature"]；为0的确定性调用会经过响应缓存
+        """
+        if temperature is None:
+            temperature = LLM_CONFIG["temperature"]
         # 添加详细的prompt日志
         logger.info(f"🤖 LLM调用开始")
         logger.info(f"📊 参数: model={LLM_CONFIG['model']}, temperature={temperature}, max_tokens={LLM_CONFIG['max_tokens']}")
@@ -89,17 +353,34 @@ class LLMManager:
         logger.info(prompt)
         logger.info(f"=" * 60)
         
+        messages = [
+            {"role": "system", "content": prompt}
+        ]
+        
+        # 只缓存确定性的调用（temperature为0），采样调用每次都应重新生成
+        cache_key = None
+        if self.cache is not None and temperature == 0:
+            cache_key = self.cache.make_key(LLM_CONFIG["model"], messages, temperature, LLM_CONFIG["max_tokens"])
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"💾 命中LLM缓存，内容长度: {len(cached)}字符")
+                return cached
+        
         for attempt in range(self.max_retries + 1):
+            # 熔断打开时直接失败，不再消耗重试
+            is_probe = self.circuit_breaker.before_call()
             try:
                 logger.info(f"🔄 LLM调用尝试 {attempt + 1}/{self.max_retries + 1}")
-                response = await self.client.chat.completions.create(
-                    model=LLM_CONFIG["model"],
-                    messages=[
-                        {"role": "system", "content": prompt}
-                    ],
-                    temperature=temperature,
-                    max_tokens=LLM_CONFIG["max_tokens"]
-                )
+                async with self.limiter:
+                    raw_response = await self.client.chat.completions.with_raw_response.create(
+                        model=LLM_CONFIG["model"],
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=LLM_CONFIG["max_tokens"]
+                    )
+                    self.limiter.on_success(self._get_remaining_requests(raw_response.headers))
+                self.circuit_breaker.record_success()
+                response = raw_response.parse()
                 
                 content = response.choices[0].message.content.strip()
                 logger.info(f"✅ LLM响应成功，内容长度: {len(content)}字符")
@@ -107,16 +388,41 @@ class LLMManager:
                 logger.info(f"=" * 60)
                 logger.info(content)
                 logger.info(f"=" * 60)
+                if cache_key is not None:
+                    self.cache.set(cache_key, content)
                 return content
                 
             except Exception as e:
+                if isinstance(e, RateLimitError):
+                    self.limiter.on_rate_limited()
+                if isinstance(e, (RateLimitError, InternalServerError, APIConnectionError)):
+                    self.circuit_breaker.record_failure()
+                elif is_probe:
+                    # 未计入熔断器的错误（如请求参数错误）不能一直占住半开探测名额
+                    self.circuit_breaker.release_probe()
                 logger.error(f"LLM调用失败 (尝试 {attempt + 1}/{self.max_retries + 1}): {e}")
                 if attempt < self.max_retries:
-                    logger.info(f"等待 {2 ** attempt} 秒后重试...")
-                    await asyncio.sleep(2 ** attempt)  # 指数退避
+                    delay = min(2 ** attempt, 30)
+                    logger.info(f"等待 {delay} 秒后重试...")
+                    await asyncio.sleep(delay)  # 指数退避
                 else:
                     logger.error(f"LLM调用最终失败，已重试 {self.max_retries} 次")
                     raise
+            except asyncio.CancelledError:
+                if is_probe:
+                    self.circuit_breaker.release_probe()
+                raise
+    
+    @staticmethod
+    def _get_remaining_requests(headers: httpx.Headers) -> Optional[int]:
+        """从响应头读取剩余请求配额，不支持该响应头的服务返回None"""
+        value = headers.get("x-ratelimit-remaining-requests")
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            return None
     
     def _get_task_prompt(self, task_type: str, context: Dict[str, Any], **kwargs) -> str:
         """根据任务类型生成prompt"""
@@ -207,6 +513,39 @@ Issue:
 
 请确保审查全面、客观，重点关注代码质量、功能完整性和最佳实践。"""
     
+    def _get_batch_code_review_prompt(self, context: Dict[str, Any], **kwargs) -> str:
+        """批量代码审查prompt，一次审查多个文件"""
+        files = context.get('files', {})
+        issue = context.get('issue', {})
+        
+        files_text = "\n\n".join(
+            f"文件：{file_path}\n```\n{code}\n```" for file_path, code in files.items()
+        )
+        
+        return f"""你是一个资深的代码审查员。
+
+请逐个审查以下 {len(files)} 个文件：
+
+Issue:
+标题: {issue.get('title', '')}
+描述: {issue.get('description', '')}
+
+{files_text}
+
+请对每个文件分别给出审查结果，每个文件以单独一行的分隔标记开头，格式如下：
+
+=== 文件：[文件路径] ===
+审查结果：[通过/不通过]
+
+总体评分：[1-10分]
+
+是否满足需求：[是/否]
+
+总体意见：
+[该文件的审查意见]
+
+请确保每个文件都有且只有一个审查结果，文件路径与上面给出的完全一致。"""
+    
     def _get_implement_issue_prompt(self, context: Dict[str, Any], **kwargs) -> str:
         """实现Issue的prompt"""
         issue = context.get('issue', {})
@@ -364,6 +703,16 @@ Issue:
                 "meets_requirements": False
             }
     
+    def _parse_batch_review_response(self, response: str) -> Dict[str, Dict[str, Any]]:
+        """解析批量代码审查响应，返回 文件路径 -> 审查结果"""
+        results = {}
+        sections = re.split(r'^=== 文件[：:](.+?) ===\s*$', response, flags=re.MULTILINE)
+        # re.split 的结果为 [前缀, 路径1, 内容1, 路径2, 内容2, ...]
+        for file_path, section in zip(sections[1::2], sections[2::2]):
+            # 模型可能照抄模板中的方括号，或给路径加上反引号、引号、加粗
+            results[file_path.strip(REVIEW_PATH_DECORATIONS)] = self._parse_review_response(section)
+        return results
+    
     def _parse_natural_language_response(self, response: str) -> Dict[str, Any]:
         """解析自然语言格式的响应"""
         try:
@@ -448,30 +797,116 @@ Issue:
         else:
             return {"error": f"任务 {task_type} 执行失败"}
     
+    def _requirements_cache_key(self, requirements: str) -> str:
+        """计算需求分析结果的缓存键
+        
+        需求文本合并空白后填入分析prompt，再连同模型和温度一起哈希：仅排版不同的同一需求得到同一个键，
+        而更换模型、温度或修改prompt模板后不会再命中旧结果。大小写不做规整，标识符的大小写差异有意义。
+        """
+        normalized = " ".join(requirements.split())
+        prompt = self._get_requirements_analysis_prompt({"requirements": normalized})
+        messages = [{"role": "system", "content": prompt}]
+        request_key = LLMResponseCache.make_key(
+            LLM_CONFIG["model"], messages, LLM_CONFIG["temperature"], LLM_CONFIG["max_tokens"]
+        )
+        # 加上前缀，与同一请求的原始响应缓存区分开（这里存的是解析后的Issue列表）
+        return hashlib.sha256(f"analyze_requirements\n{request_key}".encode("utf-8")).hexdigest()
+    
     # 保持向后兼容的方法
     async def analyze_requirements(self, requirements: str) -> list[dict[str, str]]:
-        """分析用户需求，生成 Issue 列表"""
+        """分析用户需求，生成 Issue 列表
+        
+        启用缓存时，规整后相同的需求直接复用之前的拆分结果，不再调用LLM。
+        """
+        cache_key = None
+        if self.cache is not None and LLM_CONFIG["reuse_requirement_analysis"]:
+            cache_key = self._requirements_cache_key(requirements)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                try:
+                    issues = json.loads(cached)
+                    logger.info(f"💾 复用相同需求的分析结果，共 {len(issues)} 个Issue")
+                    return issues
+                except json.JSONDecodeError as e:
+                    logger.warning(f"需求分析缓存内容无效，重新分析: {e}")
+        
         result = await self.execute_task("analyze_requirements", {
             "requirements": requirements
         })
         
         # 现在直接返回解析后的issue列表
         if isinstance(result, list):
+            # 调用失败时的兜底结果不写入缓存
+            if cache_key is not None and result != self._get_fallback_result("analyze_requirements", {}):
+                self.cache.set(cache_key, json.dumps(result, ensure_ascii=False))
             return result
         else:
             return [{"title": "实现用户需求", "description": requirements}]
     
-
-    
     async def review_code(self, issue: dict[str, Any], code: str) -> dict[str, Any]:
         """审查代码提交"""
         result = await self.execute_task("review_code", {
             "issue": issue,
-            "code": code
+            "code": code,
+            "temperature": LLM_CONFIG["review_temperature"]
         })
         
         # 现在直接返回解析后的审查结果
         if isinstance(result, dict):
             return result
         else:
-            return {"approved": False, "comments": str(result)}
\ No newline at end of file
+            return {"approved": False, "comments": str(result)}
+    
+    async def review_code_batch(self, issue: Dict[str, Any], files: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        """批量审查多个文件，把多个文件打包进同一个prompt以分摊公共prompt开销
+        
+        Args:
+            issue: Issue信息
+            files: 文件路径 -> 代码内容
+            
+        Returns:
+            文件路径 -> 审查结果
+        """
+        results = {}
+        for batch in self._chunk_review_files(files):
+            if len(batch) == 1:
+                file_path, code = next(iter(batch.items()))
+                results[file_path] = await self.review_code(issue, code)
+                continue
+            
+            prompt = self._get_batch_code_review_prompt({"issue": issue, "files": batch})
+            try:
+                response = await self._call_llm(prompt, LLM_CONFIG["review_temperature"])
+                batch_results = self._parse_batch_review_response(response)
+            except Exception as e:
+                logger.error(f"批量代码审查失败: {e}")
+                batch_results = {}
+            
+            for file_path, code in batch.items():
+                if file_path in batch_results:
+                    results[file_path] = batch_results[file_path]
+                else:
+                    # 响应中缺少该文件的结果时，退回到单文件审查
+                    logger.warning(f"批量审查结果缺少文件 {file_path}，单独审查")
+                    results[file_path] = await self.review_code(issue, code)
+        
+        return results
+    
+    def _chunk_review_files(self, files: Dict[str, str]) -> List[Dict[str, str]]:
+        """按文件数量和总字符数把待审查文件分组"""
+        batch_size = LLM_CONFIG["review_batch_size"]
+        max_chars = LLM_CONFIG["review_batch_max_chars"]
+        
+        batches = []
+        current = {}
+        current_chars = 0
+        for file_path, code in files.items():
+            if current and (len(current) >= batch_size or current_chars + len(code) > max_chars):
+                batches.append(current)
+                current = {}
+                current_chars = 0
+            current[file_path] = code
+            current_chars += len(code)
+        if current:
+            batches.append(current)
+        return batches
\ No newline at end of file
@@ -4,33 +4,77 @@
 """
 
 import os
+import fnmatch
 import asyncio
 import logging
+import re
 import shutil
 import time
 import traceback
 from pathlib import Path
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional
 from git import Repo, GitCommandError
-from .git_utils import GitManager
+from .fs_utils import copy_file
+from .git_utils import GitManager, create_empty_issues_file
+
+if TYPE_CHECKING:
+    # 只用于类型注解：运行时不导入，避免依赖 collaboration 及其 aiofiles、LLM 依赖
+    from .collaboration import CollaborationManager
 
 logger = logging.getLogger(__name__)
 
+# 体积大且从不需要复制的目录名，遍历时直接剪枝，不再进入也不再做通配符匹配
+IGNORED_DIRS = frozenset({'.git', '__pycache__', 'node_modules', '.venv', 'venv', '.pytest_cache'})
+
+# 复制参考项目时要忽略的文件和目录模式 - 只忽略必要的系统文件
+COPY_IGNORE_PATTERNS = (
+    '.git',  # 子模块/工作树中的 .git 文件
+    '__pycache__',
+    '*.pyc',
+    '*.pyo',
+    '.DS_Store',
+    'Thumbs.db',
+    '.env',
+    '.env.*',
+    # 只忽略可能导致冲突的特定文件
+    'node_modules',  # npm依赖
+    '.pytest_cache',  # pytest缓存
+    '*.log',  # 日志文件
+    '.coverage',  # 覆盖率文件
+    '.venv',  # 虚拟环境
+    'venv',   # 虚拟环境
+)
+
+# 预先把所有模式合并编译成一个正则，每个文件名只需匹配一次，而不是逐个调用 fnmatch
+COPY_IGNORE_RE = re.compile('|'.join(f'(?:{fnmatch.translate(p)})' for p in COPY_IGNORE_PATTERNS))
+
+# 复制失败时日志中列出的样例数量
+COPY_FAILURE_SAMPLES = 10
+
+# 参考项目过大未复制时，仓库根目录下指向原项目的符号链接名
+REFERENCE_LINK_NAME = "reference"
+
 class MultiRepoManager:
     """多仓库管理器"""
     
-    def __init__(self, playground_repo_url: str, agent_repos_dir: str):
+    def __init__(self, playground_repo_url: str, agent_repos_dir: str, max_parallel_setups: int = 8):
         """初始化多仓库管理器
         
         Args:
             playground_repo_url: 主playground仓库URL
             agent_repos_dir: agent仓库存储目录
+            max_parallel_setups: 同时进行的agent仓库设置数量上限
         """
         self.playground_repo_url = playground_repo_url
         self.agent_repos_dir = agent_repos_dir
         self.playground_path = os.path.join(agent_repos_dir, "playground")
         self.agent_git_managers: dict[str, GitManager] = {}
         self.playground_git_manager: Optional[GitManager] = None
+        # 以符号链接引用（而非复制）的参考项目路径，agent仓库设置时会创建同样的链接
+        self.reference_path: Optional[str] = None
+        # 限制并发的仓库设置，避免大量git进程和文件复制同时争抢磁盘
+        self._setup_semaphore = asyncio.Semaphore(max_parallel_setups)
         
         # 确保目录存在
         os.makedirs(agent_repos_dir, exist_ok=True)
@@ -76,10 +120,7 @@ class MultiRepoManager:
             
             # 确保.issues.json文件存在
             issues_file = os.path.join(self.playground_path, ".issues.json")
-            if not os.path.exists(issues_file):
-                import json
-                with open(issues_file, "w") as f:
-                    json.dump({"issues": []}, f)
+            if create_empty_issues_file(issues_file):
                 logger.info("创建.issues.json文件")
             
             self.playground_git_manager = GitManager(self.playground_path)
@@ -102,20 +143,21 @@ class MultiRepoManager:
             
             # 确保.issues.json文件存在
             issues_file = os.path.join(self.playground_path, ".issues.json")
-            if not os.path.exists(issues_file):
-                import json
-                with open(issues_file, "w") as f:
-                    json.dump({"issues": []}, f)
+            if create_empty_issues_file(issues_file):
                 logger.info("创建.issues.json文件")
             
             self.playground_git_manager = GitManager(self.playground_path)
             return self.playground_git_manager
     
-    async def setup_agent_repo(self, agent_id: str) -> GitManager:
+    async def setup_agent_repo(self, agent_id: str,
+                               collaboration_manager: Optional['CollaborationManager'] = None) -> GitManager:
         """为agent设置独立仓库
         
+        阻塞的git和文件操作在工作线程中执行，多个agent的仓库可以通过 asyncio.gather 并发设置。
+        
         Args:
             agent_id: agent ID
+            collaboration_manager: 协作管理器，提供时会把agent仓库注册进去，可选
             
         Returns:
             agent仓库的GitManager
@@ -124,54 +166,171 @@ class MultiRepoManager:
         agent_repo_path = os.path.join(self.agent_repos_dir, f"agent_{agent_id}")
         
         try:
-            if os.path.exists(agent_repo_path):
-                # 如果目录已存在，使用现有仓库
-                logger.info(f"使用现有agent仓库: {agent_repo_path}")
-            else:
-                # 创建新的agent仓库目录
-                os.makedirs(agent_repo_path)
-                
-                # 初始化Git仓库
-                repo = Repo.init(agent_repo_path)
-                logger.info(f"初始化agent仓库: {agent_repo_path}")
-                
-                # 从playground仓库复制内容（包括参考项目代码）
-                if self.playground_git_manager and os.path.exists(self.playground_path):
-                    await self._copy_repo_content(self.playground_path, agent_repo_path)
-                    logger.info(f"从playground复制参考项目内容到agent仓库: {agent_repo_path}")
+            async with self._setup_semaphore:
+                if os.path.exists(agent_repo_path):
+                    # 如果目录已存在，使用现有仓库
+                    logger.info(f"使用现有agent仓库: {agent_repo_path}")
+                else:
+                    has_playground = self.playground_git_manager and os.path.exists(self.playground_path)
+                    # 优先从playground本地克隆：对象目录用硬链接共享，检出由git一次完成，
+                    # 不再逐个复制文件；克隆失败时回退到初始化+复制
+                    if not (has_playground and await self._clone_playground(agent_repo_path)):
+                        # 创建新的agent仓库目录并初始化Git仓库
+                        await asyncio.to_thread(self._init_agent_repo, agent_repo_path)
+                        logger.info(f"初始化agent仓库: {agent_repo_path}")
+                        
+                        # 从playground仓库复制内容（包括参考项目代码）
+                        if has_playground:
+                            await self._copy_repo_content(self.playground_path, agent_repo_path)
+                            logger.info(f"从playground复制参考项目内容到agent仓库: {agent_repo_path}")
+                    
+                    await asyncio.to_thread(self._write_agent_scaffold, agent_id, agent_repo_path)
                 
-                # 创建src目录（如果不存在）
-                src_dir = os.path.join(agent_repo_path, "src")
-                os.makedirs(src_dir, exist_ok=True)
+                # 链接不在git中，clone --local 和复制都不会带过来，需要在agent仓库中单独创建
+                if self.reference_path is not None:
+                    await asyncio.to_thread(self._link_reference, agent_repo_path, self.reference_path)
                 
-                # 创建初始README文件
-                readme_path = os.path.join(agent_repo_path, "README.md")
-                if not os.path.exists(readme_path):
-                    with open(readme_path, "w", encoding="utf-8") as f:
-                        f.write(f"# Agent {agent_id} Repository\n\n")
-                        f.write(f"This is the working repository for agent {agent_id}.\n")
-                        f.write("This repository is automatically managed by the multi-agent coder system.\n")
-                        f.write("\n## Reference Project\n")
-                        f.write("This repository contains the reference project code for learning and inspiration.\n")
+                # 确保.issues.json文件存在并创建GitManager（GitManager初始化会运行git命令）
+                git_manager = await asyncio.to_thread(self._open_agent_repo, agent_id, agent_repo_path)
             
-            # 确保.issues.json文件存在
-            issues_file = os.path.join(agent_repo_path, ".issues.json")
-            if not os.path.exists(issues_file):
-                import json
-                with open(issues_file, "w") as f:
-                    json.dump({"issues": []}, f)
-                logger.info(f"为agent {agent_id} 创建.issues.json文件")
-            
-            # 创建GitManager
-            git_manager = GitManager(agent_repo_path)
             self.agent_git_managers[agent_id] = git_manager
             
+            # 注册agent仓库到协作管理器，这样第一个PR就能在agent仓库中创建分支
+            if collaboration_manager is not None:
+                collaboration_manager.register_agent_repo(agent_id, git_manager)
+            
             return git_manager
             
         except Exception as e:
             logger.error(f"设置agent仓库失败: {e}")
             raise
     
+    def link_reference_project(self, source_path: str) -> str:
+        """以符号链接只读引用过大而未复制的参考项目（阻塞操作）
+        
+        链接位于playground根目录的 reference 下，并写入 .git/info/exclude，不会被提交；
+        之后设置的agent仓库会得到同样的链接。
+        
+        Args:
+            source_path: 参考项目路径
+            
+        Returns:
+            playground中的链接路径
+        """
+        self.reference_path = os.path.abspath(source_path)
+        return self._link_reference(self.playground_path, self.reference_path)
+    
+    @staticmethod
+    def _link_reference(repo_path: str, reference_path: str) -> str:
+        """在仓库根目录创建指向参考项目的链接，并让git忽略它（阻塞操作）
+        
+        Args:
+            repo_path: 仓库路径
+            reference_path: 参考项目的绝对路径
+            
+        Returns:
+            链接路径
+        """
+        reference_link = os.path.join(repo_path, REFERENCE_LINK_NAME)
+        if not os.path.lexists(reference_link):
+            os.symlink(reference_path, reference_link, target_is_directory=True)
+        
+        # 写入本地排除规则而不是 .gitignore：不改动仓库内容，也不会被同步到其他仓库
+        exclude_file = os.path.join(repo_path, ".git", "info", "exclude")
+        pattern = f"/{REFERENCE_LINK_NAME}"
+        try:
+            with open(exclude_file, encoding="utf-8") as f:
+                content = f.read()
+        except FileNotFoundError:
+            content = ""
+        if pattern not in content.splitlines():
+            os.makedirs(os.path.dirname(exclude_file), exist_ok=True)
+            with open(exclude_file, "a", encoding="utf-8") as f:
+                if content and not content.endswith("\n"):
+                    f.write("\n")
+                f.write(pattern + "\n")
+        return reference_link
+    
+    async def _clone_playground(self, agent_repo_path: str) -> bool:
+        """用 git clone --local 从playground仓库创建agent仓库
+        
+        Args:
+            agent_repo_path: agent仓库路径
+            
+        Returns:
+            是否克隆成功
+        """
+        try:
+            await asyncio.to_thread(self._clone_local, self.playground_path, agent_repo_path)
+            logger.info(f"从playground本地克隆agent仓库: {agent_repo_path}")
+            return True
+        except GitCommandError as e:
+            logger.warning(f"本地克隆playground失败，改为复制文件: {e}")
+            # 清理克隆残留，回退路径需要一个不存在的目录
+            await asyncio.to_thread(shutil.rmtree, agent_repo_path, True)
+            return False
+    
+    @staticmethod
+    def _clone_local(playground_path: str, agent_repo_path: str):
+        """本地克隆playground并移除origin远程（阻塞操作）
+        
+        Args:
+            playground_path: playground仓库路径
+            agent_repo_path: agent仓库路径
+        """
+        repo = Repo.clone_from(playground_path, agent_repo_path, local=True)
+        # agent仓库与之前一样不设远程，同步统一由sync_agent_work_to_playground完成
+        repo.delete_remote(repo.remotes.origin)
+    
+    @staticmethod
+    def _init_agent_repo(agent_repo_path: str):
+        """创建agent仓库目录并初始化Git仓库（阻塞操作）
+        
+        Args:
+            agent_repo_path: agent仓库路径
+        """
+        os.makedirs(agent_repo_path)
+        Repo.init(agent_repo_path)
+    
+    @staticmethod
+    def _write_agent_scaffold(agent_id: str, agent_repo_path: str):
+        """创建agent仓库的src目录和初始README文件（阻塞操作）
+        
+        Args:
+            agent_id: agent ID
+            agent_repo_path: agent仓库路径
+        """
+        # 创建src目录（如果不存在）
+        src_dir = os.path.join(agent_repo_path, "src")
+        os.makedirs(src_dir, exist_ok=True)
+        
+        # 创建初始README文件
+        readme_path = os.path.join(agent_repo_path, "README.md")
+        if not os.path.exists(readme_path):
+            with open(readme_path, "w", encoding="utf-8") as f:
+                f.write(f"# Agent {agent_id} Repository\n\n")
+                f.write(f"This is the working repository for agent {agent_id}.\n")
+                f.write("This repository is automatically managed by the multi-agent coder system.\n")
+                f.write("\n## Reference Project\n")
+                f.write("This repository contains the reference project code for learning and inspiration.\n")
+    
+    @staticmethod
+    def _open_agent_repo(agent_id: str, agent_repo_path: str) -> GitManager:
+        """确保agent仓库有Issues文件并创建GitManager（阻塞操作）
+        
+        Args:
+            agent_id: agent ID
+            agent_repo_path: agent仓库路径
+            
+        Returns:
+            agent仓库的GitManager
+        """
+        issues_file = os.path.join(agent_repo_path, ".issues.json")
+        if create_empty_issues_file(issues_file):
+            logger.info(f"为agent {agent_id} 创建.issues.json文件")
+        
+        return GitManager(agent_repo_path)
+    
     async def _copy_repo_content(self, src_path: str, dst_path: str):
         """安全地复制仓库内容，排除Git元数据和冲突文件
         
@@ -179,74 +338,62 @@ class MultiRepoManager:
             src_path: 源路径
             dst_path: 目标路径
         """
-        import fnmatch
-        
-        # 定义要忽略的文件和目录模式 - 只忽略必要的系统文件
-        ignore_patterns = [
-            '.git',
-            '.git/*',
-            '__pycache__',
-            '*.pyc',
-            '*.pyo',
-            '.DS_Store',
-            'Thumbs.db',
-            '.env',
-            '.env.*',
-            # 只忽略可能导致冲突的特定文件
-            'node_modules',  # npm依赖
-            '.pytest_cache',  # pytest缓存
-            '*.log',  # 日志文件
-            '.coverage',  # 覆盖率文件
-            '.venv',  # 虚拟环境
-            'venv',   # 虚拟环境
-        ]
-        
-        def should_ignore(path, name):
-            """检查是否应该忽略某个路径"""
-            # 检查完整路径
-            full_path = os.path.join(path, name)
-            rel_path = os.path.relpath(full_path, src_path)
-            
-            for pattern in ignore_patterns:
-                if fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel_path, pattern):
-                    return True
-            return False
         
         logger.info(f"📁 开始复制参考项目内容: {src_path} -> {dst_path}")
-        copied_files = 0
-        
-        # 递归复制文件，但排除指定的模式
-        for root, dirs, files in os.walk(src_path):
-            # 过滤要忽略的目录
-            original_dirs = dirs[:]
-            dirs[:] = [d for d in dirs if not should_ignore(root, d)]
-            
-            # 记录被忽略的目录
-            ignored_dirs = set(original_dirs) - set(dirs)
-            if ignored_dirs:
-                logger.debug(f"🚫 忽略目录: {ignored_dirs}")
-            
-            for file in files:
-                if should_ignore(root, file):
-                    logger.debug(f"🚫 忽略文件: {file}")
-                    continue
-                
-                src_file = os.path.join(root, file)
-                rel_path = os.path.relpath(src_file, src_path)
-                dst_file = os.path.join(dst_path, rel_path)
-                
+        
+        def collect_files() -> list[tuple[str, str]]:
+            """在工作线程中遍历源目录，创建目标目录并返回需要复制的 (源文件, 目标文件) 列表"""
+            pairs = []
+            
+            def walk(src_dir: str, dst_dir: str):
                 # 确保目标目录存在
-                dst_dir = os.path.dirname(dst_file)
-                if dst_dir:
-                    os.makedirs(dst_dir, exist_ok=True)
-                
-                try:
-                    # 复制文件
-                    shutil.copy2(src_file, dst_file)
-                    copied_files += 1
-                    logger.debug(f"📄 复制文件: {rel_path}")
-                except Exception as e:
-                    logger.warning(f"⚠️ 跳过文件 {rel_path}: {e}")
+                os.makedirs(dst_dir, exist_ok=True)
+                # scandir 的 DirEntry 缓存了类型信息，判断文件/目录不需要额外的 stat 调用
+                with os.scandir(src_dir) as it:
+                    for entry in it:
+                        name = entry.name
+                        if entry.is_dir(follow_symlinks=False):
+                            if name in IGNORED_DIRS or COPY_IGNORE_RE.match(name):
+                                logger.debug(f"🚫 忽略目录: {name}")
+                                continue
+                            walk(entry.path, os.path.join(dst_dir, name))
+                        elif entry.is_file():
+                            if COPY_IGNORE_RE.match(name):
+                                logger.debug(f"🚫 忽略文件: {name}")
+                                continue
+                            pairs.append((entry.path, os.path.join(dst_dir, name)))
+            
+            walk(src_path, dst_path)
+            return pairs
+        
+        def copy_one(pair: tuple[str, str]) -> Optional[str]:
+            """复制单个文件，成功返回None，失败返回错误信息"""
+            src_file, dst_file = pair
+            try:
+                # 复制文件内容和权限位，参考代码不需要copy2额外复制的时间戳和扩展属性
+                copy_file(src_file, dst_file)
+                return None
+            except Exception as e:
+                return str(e)
+        
+        def copy_tree() -> int:
+            """先收集文件列表，再用线程池并发复制，返回复制的文件数"""
+            pairs = collect_files()
+            if not pairs:
+                return 0
+            failures = []
+            # 文件之间没有依赖，多个线程同时复制可以让磁盘读写重叠进行
+            with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+                for (src_file, _), error in zip(pairs, executor.map(copy_one, pairs)):
+                    if error is not None:
+                        failures.append((os.path.relpath(src_file, src_path), error))
+            # 失败往往成批出现，汇总成一条日志，只列出前几个样例
+            if failures:
+                samples = "; ".join(f"{rel_path}: {error}" for rel_path, error in failures[:COPY_FAILURE_SAMPLES])
+                logger.warning(f"⚠️ 跳过 {len(failures)} 个文件，前 {min(len(failures), COPY_FAILURE_SAMPLES)} 个: {samples}")
+            return len(pairs) - len(failures)
+        
+        copied_files = await asyncio.to_thread(copy_tree)
         
         logger.info(f"✅ 完成复制，共复制了 {copied_files} 个文件")
     
@@ -302,29 +449,16 @@ class MultiRepoManager:
                 
                 logger.info(f"同步 {len(files_to_sync)} 个文件从 {agent_id} 到 playground")
                 
-                # 复制文件到playground
-                copied_files = []
-                for file_path in files_to_sync:
-                    # 跳过特殊文件
-                    if file_path.startswith('.') or file_path.startswith('__'):
-                        continue
-                        
-                    src_file = os.path.join(agent_repo_path, file_path)
-                    dst_file = os.path.join(playground_git.repo_path, file_path)
-                    
-                    if not os.path.exists(src_file):
-                        continue
-                    
-                    # 确保目标目录存在
-                    os.makedirs(os.path.dirname(dst_file), exist_ok=True)
-                    
-                    # 复制文件
-                    try:
-                        shutil.copy2(src_file, dst_file)
-                        copied_files.append(file_path)
-                        logger.debug(f"📄 同步文件: {file_path}")
-                    except Exception as e:
-                        logger.warning(f"⚠️ 同步文件失败 {file_path}: {e}")
+                # 复制文件到playground：各文件在线程池中并发复制，不阻塞事件循环（跳过特殊文件）
+                files_to_copy = [
+                    f for f in files_to_sync
+                    if not (f.startswith('.') or f.startswith('__'))
+                ]
+                results = await asyncio.gather(*(
+                    asyncio.to_thread(self._sync_file, agent_repo_path, playground_git.repo_path, f)
+                    for f in files_to_copy
+                ))
+                copied_files = [f for f, copied in zip(files_to_copy, results) if copied]
                 
                 if copied_files:
                     # 提交更改到playground
@@ -354,6 +488,34 @@ class MultiRepoManager:
             logger.error(f"❌ 同步agent工作失败: {e}")
             return False
     
+    @staticmethod
+    def _sync_file(src_root: str, dst_root: str, file_path: str) -> bool:
+        """把单个文件从源仓库复制到目标仓库的相同相对路径（同步执行，供线程池调用）
+        
+        Args:
+            src_root: 源仓库路径
+            dst_root: 目标仓库路径
+            file_path: 相对仓库根目录的文件路径
+            
+        Returns:
+            是否复制了该文件
+        """
+        src_file = os.path.join(src_root, file_path)
+        dst_file = os.path.join(dst_root, file_path)
+        
+        if not os.path.exists(src_file):
+            return False
+        
+        try:
+            # 确保目标目录存在
+            os.makedirs(os.path.dirname(dst_file), exist_ok=True)
+            copy_file(src_file, dst_file)
+            logger.debug(f"📄 同步文件: {file_path}")
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ 同步文件失败 {file_path}: {e}")
+            return False
+    
     async def sync_playground_to_agents(self) -> bool:
         """将playground的更新同步到所有agent仓库
         
@@ -377,30 +539,18 @@ class MultiRepoManager:
             except Exception as e:
                 logger.debug(f"跳过拉取playground更新: {e}")
             
+            # playground只扫描一次，结果在所有agent之间复用；生成器在工作线程中遍历，不阻塞事件循环
+            playground_files = await asyncio.to_thread(list, self._scan_playground_files(self.playground_path))
+            
             # 同步到所有agent仓库
             for agent_id, git_manager in self.agent_git_managers.items():
                 
                 # 获取agent仓库路径
                 agent_repo_path = os.path.join(self.agent_repos_dir, f"agent_{agent_id}")
                 
-                # 复制playground的更新到agent仓库
+                # 复制playground的更新到agent仓库（在工作线程中执行，不阻塞事件循环）
                 # 这里可以实现更智能的合并策略，避免覆盖agent的工作
-                for root, dirs, files in os.walk(self.playground_path):
-                    if '.git' in dirs:
-                        dirs.remove('.git')
-                    
-                    for file in files:
-                        if file.startswith('.'):
-                            continue
-                        
-                        src_file = os.path.join(root, file)
-                        rel_path = os.path.relpath(src_file, self.playground_path)
-                        dst_file = os.path.join(agent_repo_path, rel_path)
-                        
-                        # 只复制不存在的文件，避免覆盖agent的工作
-                        if not os.path.exists(dst_file):
-                            os.makedirs(os.path.dirname(dst_file), exist_ok=True)
-                            shutil.copy2(src_file, dst_file)
+                await asyncio.to_thread(self._copy_missing_files, playground_files, agent_repo_path)
                 
                 # 提交更新
                 await git_manager.commit_changes(
@@ -415,6 +565,41 @@ class MultiRepoManager:
             logger.error(f"同步playground到agent仓库失败: {e}")
             return False
     
+    @staticmethod
+    def _copy_missing_files(files: list[tuple[str, str]], dst_root: str):
+        """把目标仓库中还不存在的文件复制过去（阻塞操作）
+        
+        Args:
+            files: (源文件路径, 相对路径) 列表
+            dst_root: 目标仓库路径
+        """
+        for src_file, rel_path in files:
+            dst_file = os.path.join(dst_root, rel_path)
+            
+            # 只复制不存在的文件，避免覆盖agent的工作
+            if not os.path.exists(dst_file):
+                os.makedirs(os.path.dirname(dst_file), exist_ok=True)
+                copy_file(src_file, dst_file)
+    
+    def _scan_playground_files(self, root: str, rel_root: str = ""):
+        """基于 os.scandir 遍历playground文件，跳过 .git 目录和隐藏文件
+        
+        Args:
+            root: 当前遍历的目录
+            rel_root: 当前目录相对playground的路径
+            
+        Yields:
+            (文件绝对路径, 相对路径)
+        """
+        with os.scandir(root) as it:
+            for entry in it:
+                rel_path = os.path.join(rel_root, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name != '.git':
+                        yield from self._scan_playground_files(entry.path, rel_path)
+                elif entry.is_file() and not entry.name.startswith('.'):
+                    yield entry.path, rel_path
+    
     def get_agent_git_manager(self, agent_id: str) -> Optional[GitManager]:
         """获取agent的GitManager
         
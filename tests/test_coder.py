@@ -0,0 +1,38 @@
+"""编码员代理测试：共享信号量限制同时实现中的Issue数量"""
+
+import asyncio
+
+from multi_agent_coder.agents.coder import CoderAgent
+from multi_agent_coder.agents.memory_manager import MemoryManager
+
+
+async def test_shared_semaphore_bounds_in_flight_issues(tmp_path):
+    semaphore = asyncio.Semaphore(2)
+    active = 0
+    peak = 0
+
+    async def fake_implement_issue(issue):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+        return {"success": True, "issue": issue["id"]}
+
+    coders = []
+    for i in range(4):
+        agent_id = f"coder_{i}"
+        coder = CoderAgent(agent_id, None, str(tmp_path),
+                           memory_manager=MemoryManager(agent_id, str(tmp_path / ".memory")),
+                           issue_semaphore=semaphore)
+        coder.implement_issue = fake_implement_issue
+        coders.append(coder)
+
+    # 每个coder同时领取两个Issue，共8个实现请求竞争2个名额
+    results = await asyncio.gather(
+        *(coder._implement_issue_bounded({"id": f"{i}-{n}"})
+          for i, coder in enumerate(coders) for n in range(2))
+    )
+
+    assert peak == 2
+    assert all(result["success"] for result in results)
@@ -0,0 +1,171 @@
+"""Issues 文件管理测试：原子创建与多个代理竞争认领"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from multi_agent_coder import json_utils
+from multi_agent_coder.git_utils import EMPTY_ISSUES_JSON, GitManager, create_empty_issues_file
+
+
+def _race(func, workers: int = 8) -> list:
+    """在多个线程中同时调用 func，返回各线程的结果"""
+    barrier = threading.Barrier(workers)
+
+    def run():
+        barrier.wait()
+        return func()
+
+    with ThreadPoolExecutor(workers) as pool:
+        futures = [pool.submit(run) for _ in range(workers)]
+        return [future.result() for future in futures]
+
+
+def _create_in_process(issues_file: str, barrier, results) -> None:
+    barrier.wait()
+    results.put(create_empty_issues_file(issues_file))
+
+
+# ---------- create_empty_issues_file ----------
+
+def test_create_empty_issues_file_does_not_overwrite(tmp_path):
+    issues_file = tmp_path / ".issues.json"
+    assert create_empty_issues_file(str(issues_file)) is True
+    assert issues_file.read_bytes() == EMPTY_ISSUES_JSON
+
+    issues_file.write_bytes(b'{"issues": [{"id": "1"}]}')
+    assert create_empty_issues_file(str(issues_file)) is False
+    assert issues_file.read_bytes() == b'{"issues": [{"id": "1"}]}'
+
+
+def test_create_empty_issues_file_process_race_creates_once(tmp_path):
+    # 多个进程同时初始化同一个 Issues 文件，只有一个能创建成功
+    issues_file = str(tmp_path / ".issues.json")
+    ctx = multiprocessing.get_context("fork")
+    workers = 8
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+
+    processes = [
+        ctx.Process(target=_create_in_process, args=(issues_file, barrier, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    created = [results.get() for _ in range(workers)]
+    assert created.count(True) == 1
+    assert open(issues_file, "rb").read() == EMPTY_ISSUES_JSON
+    assert os.listdir(tmp_path) == [".issues.json"]
+
+
+def test_create_empty_issues_file_race_creates_once(tmp_path):
+    issues_file = tmp_path / ".issues.json"
+    results = _race(lambda: create_empty_issues_file(str(issues_file)))
+
+    assert results.count(True) == 1
+    assert issues_file.read_bytes() == EMPTY_ISSUES_JSON
+    # 临时文件全部清理干净
+    assert os.listdir(tmp_path) == [".issues.json"]
+
+
+def test_create_empty_issues_file_race_without_hard_links(tmp_path, monkeypatch):
+    def no_link(src, dst):
+        raise PermissionError(1, "Operation not permitted")
+
+    monkeypatch.setattr(os, "link", no_link)
+    issues_file = tmp_path / ".issues.json"
+    results = _race(lambda: create_empty_issues_file(str(issues_file)))
+
+    assert results.count(True) == 1
+    assert issues_file.read_bytes() == EMPTY_ISSUES_JSON
+    assert os.listdir(tmp_path) == [".issues.json"]
+
+
+# ---------- claim_next_open_issue ----------
+
+@pytest.fixture
+def repo_path(tmp_path):
+    path = tmp_path / "playground"
+    GitManager(str(path))
+    return str(path)
+
+
+async def test_competing_coders_claim_distinct_issues(repo_path):
+    # 两个独立的 GitManager 模拟两个进程中的代理，只通过文件锁互斥
+    first, second = GitManager(repo_path), GitManager(repo_path)
+    await first.create_issues([("A", "a"), ("B", "b")])
+
+    claimed = await asyncio.gather(
+        first.claim_next_open_issue("coder_1"),
+        second.claim_next_open_issue("coder_2"),
+    )
+
+    assert all(issue is not None for issue in claimed)
+    assert claimed[0]["id"] != claimed[1]["id"]
+
+    issues = json_utils.loads(open(os.path.join(repo_path, ".issues.json"), "rb").read())["issues"]
+    assert sorted(issue["assigned_to"] for issue in issues) == ["coder_1", "coder_2"]
+    assert all(issue["status"] == "assigned" for issue in issues)
+
+
+async def test_only_one_coder_claims_the_last_issue(repo_path):
+    managers = [GitManager(repo_path) for _ in range(4)]
+    await managers[0].create_issues([("A", "a")])
+
+    claimed = await asyncio.gather(
+        *(manager.claim_next_open_issue(f"coder_{i}") for i, manager in enumerate(managers))
+    )
+
+    winners = [issue for issue in claimed if issue is not None]
+    assert len(winners) == 1
+
+    issues = json_utils.loads(open(os.path.join(repo_path, ".issues.json"), "rb").read())["issues"]
+    assert [(issue["status"], issue["assigned_to"]) for issue in issues] == [
+        ("assigned", winners[0]["assigned_to"])
+    ]
+
+
+async def test_claimed_issue_is_not_shared_with_cache(repo_path):
+    manager = GitManager(repo_path)
+    await manager.create_issues([("A", "a"), ("B", "b")])
+
+    issue = await manager.claim_next_open_issue("coder_1")
+    issue["status"] = "modified by caller"
+
+    open_issues = manager.get_open_issues_cached()
+    assert [i["title"] for i in open_issues] == ["B"]
+    open_issues[0]["status"] = "modified by caller"
+    assert manager.get_open_issues_cached()[0]["status"] == "open"
+
+
+async def test_cancelled_operation_holds_lock_until_worker_finishes(repo_path):
+    manager = GitManager(repo_path)
+    started, proceed = threading.Event(), threading.Event()
+    finished = []
+
+    def slow_operation():
+        started.set()
+        proceed.wait(5)
+        finished.append(True)
+
+    task = asyncio.create_task(manager._retry_with_backoff(slow_operation))
+    await asyncio.to_thread(started.wait, 5)
+    task.cancel()
+    await asyncio.sleep(0.05)
+
+    # 取消后工作线程仍在运行，锁必须继续持有
+    assert not task.done()
+    assert manager._lock_fd is not None
+
+    proceed.set()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert finished == [True]
+    assert manager._lock_fd is None
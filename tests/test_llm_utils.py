@@ -0,0 +1,235 @@
+"""LLM 调用基础设施测试：自适应并发限制器、熔断器和响应缓存"""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from multi_agent_coder import llm_utils
+from multi_agent_coder.llm_utils import (
+    AdaptiveConcurrencyLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    LLMResponseCache,
+)
+
+
+class FakeClock:
+    """可手动拨动的时钟，替换 time.time / time.monotonic"""
+
+    def __init__(self):
+        self.now = time.time()
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(llm_utils.time, "time", fake)
+    monkeypatch.setattr(llm_utils.time, "monotonic", fake)
+    return fake
+
+
+# ---------- AdaptiveConcurrencyLimiter ----------
+
+def test_limiter_halves_on_rate_limit_down_to_min():
+    limiter = AdaptiveConcurrencyLimiter(max_limit=8, min_limit=2)
+    limiter.on_rate_limited()
+    assert limiter.limit == 4
+    limiter.on_rate_limited()
+    assert limiter.limit == 2
+    limiter.on_rate_limited()
+    assert limiter.limit == 2
+
+
+def test_limiter_increases_by_one_after_success_streak():
+    limiter = AdaptiveConcurrencyLimiter(max_limit=8, increase_every=3)
+    limiter.on_rate_limited()
+    assert limiter.limit == 4
+
+    for _ in range(2):
+        limiter.on_success()
+    assert limiter.limit == 4
+    limiter.on_success()
+    assert limiter.limit == 5
+
+
+def test_limiter_never_exceeds_max():
+    limiter = AdaptiveConcurrencyLimiter(max_limit=2, increase_every=1)
+    for _ in range(10):
+        limiter.on_success()
+    assert limiter.limit == 2
+
+
+def test_limiter_shrinks_when_quota_nearly_exhausted():
+    limiter = AdaptiveConcurrencyLimiter(max_limit=8)
+    limiter.in_flight = 3
+    limiter.on_success(remaining_requests=3)
+    assert limiter.limit == 4
+
+
+def test_limiter_rate_limit_resets_success_streak():
+    limiter = AdaptiveConcurrencyLimiter(max_limit=8, increase_every=2)
+    limiter.on_rate_limited()
+    limiter.on_success()
+    limiter.on_rate_limited()
+    limiter.on_success()
+    assert limiter.limit == 2
+
+
+async def test_limiter_caps_concurrent_holders():
+    limiter = AdaptiveConcurrencyLimiter(max_limit=4)
+    limiter.on_rate_limited()
+    limiter.on_rate_limited()
+    assert limiter.limit == 1
+
+    active = 0
+    peak = 0
+
+    async def worker():
+        nonlocal active, peak
+        async with limiter:
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    await asyncio.gather(*(worker() for _ in range(5)))
+    assert peak == 1
+    assert limiter.in_flight == 0
+
+
+# ---------- CircuitBreaker ----------
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=30)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_half_open_after_cooldown_then_closes_on_success(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=30)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now += 29
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    clock.now += 2
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_breaker_half_open_failure_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=5, cooldown=10)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.now += 11
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    # 半开状态下一次失败就重新打开，不必再累计到阈值
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_breaker_half_open_admits_a_single_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10)
+    breaker.record_failure()
+    clock.now += 11
+
+    assert breaker.before_call() is True
+    # 探测结果记录前，其余调用继续被拒绝
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    # 探测未计入熔断器时释放名额，下一个调用成为新的探测
+    breaker.release_probe()
+    assert breaker.before_call() is True
+
+    breaker.record_success()
+    assert breaker.before_call() is False
+    assert breaker.before_call() is False
+
+
+def test_breaker_success_resets_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=10)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+# ---------- LLMResponseCache ----------
+
+def test_cache_round_trip_and_persists_to_disk(tmp_path):
+    cache = LLMResponseCache(str(tmp_path))
+    key = cache.make_key("m", [{"role": "system", "content": "hi"}], 0, 100)
+    assert cache.get(key) is None
+
+    cache.set(key, "响应")
+    assert cache.get(key) == "响应"
+    # 新实例（新进程）从磁盘读取
+    assert LLMResponseCache(str(tmp_path)).get(key) == "响应"
+
+
+def test_cache_key_depends_on_request_parameters():
+    messages = [{"role": "system", "content": "hi"}]
+    key = LLMResponseCache.make_key("m", messages, 0, 100)
+    assert key == LLMResponseCache.make_key("m", list(messages), 0, 100)
+    assert key != LLMResponseCache.make_key("other", messages, 0, 100)
+    assert key != LLMResponseCache.make_key("m", messages, 0.7, 100)
+    assert key != LLMResponseCache.make_key("m", messages, 0, 200)
+
+
+def test_cache_lru_evicts_least_recently_used(tmp_path):
+    cache = LLMResponseCache(str(tmp_path), memory_entries=2)
+    cache.set("a" * 64, "A")
+    cache.set("b" * 64, "B")
+    # 访问 a 后，b 成为最久未使用的条目
+    assert cache.get("a" * 64) == "A"
+    cache.set("c" * 64, "C")
+
+    assert list(cache._memory) == ["a" * 64, "c" * 64]
+    # 被淘汰的条目仍可从磁盘读回，并重新进入进程内缓存
+    assert cache.get("b" * 64) == "B"
+    assert list(cache._memory) == ["c" * 64, "b" * 64]
+
+
+def test_cache_ttl_expires_memory_and_disk_entries(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path), ttl=60)
+    key = "d" * 64
+    cache.set(key, "D")
+    os.utime(cache._path_for(key), (clock.now, clock.now))
+
+    clock.now += 30
+    assert cache.get(key) == "D"
+
+    clock.now += 31
+    assert cache.get(key) is None
+    assert key not in cache._memory
+    assert LLMResponseCache(str(tmp_path), ttl=60).get(key) is None
+
+
+def test_cache_without_ttl_never_expires(tmp_path, clock):
+    cache = LLMResponseCache(str(tmp_path))
+    cache.set("e" * 64, "E")
+    clock.now += 10 * 365 * 24 * 3600
+    assert cache.get("e" * 64) == "E"
@@ -0,0 +1,74 @@
+"""记忆管理器测试：批量写入与 SQLite 后端"""
+
+import pytest
+
+from multi_agent_coder.agents.memory_manager import MemoryManager, SQLiteMemoryManager
+
+
+@pytest.fixture(params=[MemoryManager, SQLiteMemoryManager])
+def manager_cls(request):
+    return request.param
+
+
+def test_store_memory_persists_immediately(tmp_path, manager_cls):
+    manager = manager_cls("coder_1", str(tmp_path))
+    manager.store_memory("第一条")
+
+    assert [m.context for m in manager_cls("coder_1", str(tmp_path)).memories] == ["第一条"]
+
+
+def test_batch_defers_persistence_until_exit(tmp_path, manager_cls):
+    manager = manager_cls("coder_1", str(tmp_path))
+
+    with manager.batch():
+        manager.store_memory("一")
+        manager.store_memory("二")
+        # 批次中新记忆立即可被检索，但尚未持久化
+        assert [m.context for m in manager.memories] == ["一", "二"]
+        assert manager_cls("coder_1", str(tmp_path)).memories == []
+
+    assert sorted(m.context for m in manager_cls("coder_1", str(tmp_path)).memories) == ["一", "二"]
+
+
+def test_flush_persists_without_ending_batch(tmp_path, manager_cls):
+    manager = manager_cls("coder_1", str(tmp_path))
+
+    with manager.batch():
+        manager.store_memory("一")
+        manager.flush()
+        assert len(manager_cls("coder_1", str(tmp_path)).memories) == 1
+
+        manager.store_memory("二")
+        assert len(manager_cls("coder_1", str(tmp_path)).memories) == 1
+
+    assert len(manager_cls("coder_1", str(tmp_path)).memories) == 2
+
+
+def test_nested_batch_persists_at_outermost_exit(tmp_path, manager_cls):
+    manager = manager_cls("coder_1", str(tmp_path))
+
+    with manager.batch():
+        with manager.batch():
+            manager.store_memory("一")
+        assert manager_cls("coder_1", str(tmp_path)).memories == []
+
+    assert len(manager_cls("coder_1", str(tmp_path)).memories) == 1
+
+
+def test_batch_persists_when_body_raises(tmp_path, manager_cls):
+    manager = manager_cls("coder_1", str(tmp_path))
+
+    with pytest.raises(RuntimeError):
+        with manager.batch():
+            manager.store_memory("一")
+            raise RuntimeError("中断")
+
+    assert len(manager_cls("coder_1", str(tmp_path)).memories) == 1
+
+
+def test_sqlite_memories_are_isolated_per_agent(tmp_path):
+    SQLiteMemoryManager("coder_1", str(tmp_path)).store_memories(["一", "二"])
+    SQLiteMemoryManager("coder_2", str(tmp_path)).store_memory("三")
+
+    assert sorted(m.context for m in SQLiteMemoryManager("coder_1", str(tmp_path)).memories) == ["一", "二"]
+    assert [m.context for m in SQLiteMemoryManager("coder_2", str(tmp_path)).memories] == ["三"]
@@ -0,0 +1,31 @@
+"""多仓库管理器测试：过大的参考项目以链接引用"""
+
+import os
+
+from git import Repo
+
+from multi_agent_coder.multi_repo_manager import MultiRepoManager
+
+
+async def test_reference_link_is_ignored_and_exposed_to_agents(tmp_path):
+    reference = tmp_path / "big_project"
+    reference.mkdir()
+    (reference / "main.py").write_text("print('hi')\n")
+
+    manager = MultiRepoManager("", str(tmp_path / "repos"))
+    await manager.setup_playground_repo()
+    link = manager.link_reference_project(str(reference))
+    # 重复链接不会重复写入排除规则
+    manager.link_reference_project(str(reference))
+
+    assert os.path.realpath(link) == str(reference)
+    exclude = (tmp_path / "repos" / "playground" / ".git" / "info" / "exclude").read_text()
+    assert exclude.splitlines().count("/reference") == 1
+    assert "reference" not in Repo(manager.playground_path).untracked_files
+
+    git_manager = await manager.setup_agent_repo("coder_1")
+
+    agent_link = os.path.join(git_manager.repo_path, "reference")
+    assert os.path.realpath(agent_link) == str(reference)
+    assert os.path.exists(os.path.join(agent_link, "main.py"))
+    assert not any(path.startswith("reference") for path in Repo(git_manager.repo_path).untracked_files)